@@ -0,0 +1,26 @@
+"""Shared set up for the benchmark scripts in this directory."""
+
+import os
+import sys
+import timeit
+
+import django
+from django.conf import settings
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def setup(**options):
+    """Configure a minimal Django project for running a benchmark"""
+    options.setdefault(
+        "TEMPLATES",
+        [{"BACKEND": "django.template.backends.django.DjangoTemplates"}],
+    )
+    options.setdefault("INSTALLED_APPS", ["django_navtag"])
+    settings.configure(**options)
+    django.setup()
+
+
+def best_time(func, number, repeat=5):
+    """Return the best time (in seconds) for a single call of ``func``"""
+    return min(timeit.repeat(func, number=number, repeat=repeat)) / number
@@ -0,0 +1,118 @@
+#!/usr/bin/env python3
+"""Measure the size and load time of a large (12,000 item) cached menu.
+
+Compares the array-backed ``MenuTree`` against a nested dict per item (holding
+its label, URL and a dict of children), comparing memory held, pickled size
+and unpickling time, along with looking up the active items.
+
+Run with ``python benchmarks/menu_tree.py``.
+"""
+
+import pickle
+import tracemalloc
+
+from common import best_time, setup
+
+setup()
+
+from django_navtag.trees import MenuTree  # noqa: E402
+
+SECTIONS = 20
+PAGES = 60
+SUBPAGES = 9
+
+
+def build_rows():
+    paths, urls, labels, parents = [], [], [], []
+
+    def add(path, parent):
+        paths.append(path)
+        urls.append("/" + path.replace(".", "/") + "/")
+        labels.append(path.rsplit(".", 1)[-1].title())
+        parents.append(parent)
+        return len(paths) - 1
+
+    for s in range(SECTIONS):
+        section = add("section%d" % s, -1)
+        for p in range(PAGES):
+            page = add("section%d.page%d" % (s, p), section)
+            for c in range(SUBPAGES):
+                add("section%d.page%d.sub%d" % (s, p, c), page)
+    return paths, urls, labels, parents
+
+
+def build_nested(paths, urls, labels, parents):
+    roots = {}
+    nodes = []
+    for path, url, label, parent in zip(paths, urls, labels, parents):
+        node = {"label": label, "url": url, "children": {}}
+        siblings = roots if parent < 0 else nodes[parent]["children"]
+        siblings[path.rsplit(".", 1)[-1]] = node
+        nodes.append(node)
+    return roots
+
+
+def nested_active(roots, active_path):
+    active = []
+    children = roots
+    for part in active_path:
+        node = children.get(part)
+        if node is None:
+            break
+        active.append(node)
+        children = node["children"]
+    return active
+
+
+def measure(build):
+    tracemalloc.start()
+    obj = build()
+    size = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return obj, size
+
+
+def main():
+    rows = build_rows()
+    # Use unpickled copies, as they would come out of the cache.
+    nested, nested_size = measure(
+        lambda: pickle.loads(pickle.dumps(build_nested(*rows)))
+    )
+    tree, tree_size = measure(lambda: pickle.loads(pickle.dumps(MenuTree(*rows))))
+    nested_pickle = pickle.dumps(nested, pickle.HIGHEST_PROTOCOL)
+    tree_pickle = pickle.dumps(tree, pickle.HIGHEST_PROTOCOL)
+
+    nested_load = best_time(lambda: pickle.loads(nested_pickle), 20)
+    tree_load = best_time(lambda: pickle.loads(tree_pickle), 20)
+
+    active_path = ("section7", "page40", "sub3")
+    tree.active_items(active_path)  # Build the path index.
+    nested_lookup = best_time(lambda: nested_active(nested, active_path), 10000)
+    tree_lookup = best_time(lambda: tree.active_items(active_path), 10000)
+
+    print("{} menu items".format(len(tree)))
+    print("                  nested dicts   MenuTree")
+    print(
+        "  memory:        {:10.0f} KB {:7.0f} KB".format(
+            nested_size / 1024, tree_size / 1024
+        )
+    )
+    print(
+        "  pickled:       {:10.0f} KB {:7.0f} KB".format(
+            len(nested_pickle) / 1024, len(tree_pickle) / 1024
+        )
+    )
+    print(
+        "  unpickle:      {:10.2f} ms {:7.2f} ms".format(
+            nested_load * 1e3, tree_load * 1e3
+        )
+    )
+    print(
+        "  active items:  {:10.2f} us {:7.2f} us".format(
+            nested_lookup * 1e6, tree_lookup * 1e6
+        )
+    )
+
+
+if __name__ == "__main__":
+    main()
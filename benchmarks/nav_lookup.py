@@ -0,0 +1,61 @@
+#!/usr/bin/env python3
+"""Benchmark sub-navigation lookups, e.g. ``{% if nav.products.phones %}``.
+
+Compares cached child views (with a falsy sentinel for missing items) against
+allocating a new ``Nav`` per lookup and raising ``KeyError`` for missing items,
+which is how lookups used to work.
+
+Run with ``python benchmarks/nav_lookup.py``.
+"""
+
+from common import best_time, setup
+
+setup()
+
+from django import template  # noqa: E402
+
+from django_navtag.templatetags.navtag import Nav  # noqa: E402
+
+ITEMS = 300
+
+
+class UncachedNav(Nav):
+    def __getitem__(self, key):
+        return UncachedNav(
+            self._tree[key], state=self._state, prefix=self._prefix + (key,)
+        )
+
+
+def build_template():
+    lookups = []
+    for i in range(ITEMS):
+        # One in three lookups is for an item that isn't active.
+        section = "products" if i % 3 else "about"
+        lookups.append("{%% if nav.%s.item%d %%}x{%% endif %%}" % (section, i % 20))
+    return template.Template("".join(lookups))
+
+
+def bench(nav_class, tmpl, number):
+    tree = {"products": {"item%d" % i: True for i in range(20)}}
+
+    def render():
+        nav = nav_class()
+        nav.update(tree)
+        tmpl.render(template.Context({"nav": nav}))
+
+    return best_time(render, number)
+
+
+def main():
+    tmpl = build_template()
+    number = 200
+    before = bench(UncachedNav, tmpl, number)
+    after = bench(Nav, tmpl, number)
+    print("{} nav lookups per render".format(ITEMS))
+    print("  uncached, raising: {:8.1f} us/render".format(before * 1e6))
+    print("  cached views:      {:8.1f} us/render".format(after * 1e6))
+    print("  speedup:           {:8.2f}x".format(before / after))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,75 @@
+#!/usr/bin/env python3
+"""Measure the memory held by navs that are alive at the same time.
+
+Compares the compact ``__slots__`` nav (an interned path plus a small shared
+state object) against the previous representation: a per-instance ``__dict__``
+holding a nested dict-of-dicts tree, a self-referencing root and a lazily
+attached text value.
+
+Run with ``python benchmarks/nav_memory.py``.
+"""
+
+import tracemalloc
+
+from common import setup
+
+setup()
+
+from django_navtag.templatetags.navtag import Nav, intern_path  # noqa: E402
+
+COUNT = 10000
+ITEMS = ["home", "products.phones", "products.electronics.tablets", "about.team"]
+
+
+class LegacyNav(object):
+    def __init__(self, tree=None, root=None):
+        self._root = root or self
+        self._tree = tree or {}
+
+    def __getitem__(self, key):
+        return LegacyNav(self._tree[key], root=self._root)
+
+    def set_item(self, item):
+        value = True
+        for part in reversed(item.split(".")):
+            value = {part: value}
+        self._tree.clear()
+        self._tree.update(value)
+
+
+def legacy_nav(item):
+    nav = LegacyNav()
+    nav.set_item(item)
+    nav._text_value = ' class="active"'
+    return nav
+
+
+def compact_nav(item):
+    nav = Nav()
+    nav._activate(intern_path(item))
+    nav._text = ' class="active"'
+    return nav
+
+
+def measure(factory):
+    # Warm up any caches so only the per-nav memory is measured.
+    [factory(item) for item in ITEMS]
+    tracemalloc.start()
+    navs = [factory(ITEMS[i % len(ITEMS)]) for i in range(COUNT)]
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del navs
+    return size
+
+
+def main():
+    legacy = measure(legacy_nav)
+    compact = measure(compact_nav)
+    print("{} navs alive at once".format(COUNT))
+    print("  dict-based: {:8.0f} bytes/nav".format(legacy / COUNT))
+    print("  compact:    {:8.0f} bytes/nav".format(compact / COUNT))
+    print("  saving:     {:8.1%}".format(1 - compact / legacy))
+
+
+if __name__ == "__main__":
+    main()
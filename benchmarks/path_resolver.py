@@ -0,0 +1,68 @@
+#!/usr/bin/env python3
+"""Benchmark resolving request paths to nav items by URL prefix.
+
+Builds a ``PathResolver`` from 100,000 CMS-style prefixes and compares its
+lookups against scanning the prefixes (longest first) for a match, which is
+what a simple prefix mapping would otherwise do.
+
+Run with ``python benchmarks/path_resolver.py``.
+"""
+
+import random
+import time
+
+from common import best_time, setup
+
+setup()
+
+from django_navtag.resolvers import PathResolver  # noqa: E402
+
+PREFIXES = 100000
+
+
+def build_prefixes():
+    prefixes = {}
+    for i in range(PREFIXES):
+        section = "section%d" % (i % 50)
+        page = "page%d" % (i // 50)
+        prefixes["/{}/{}/".format(section, page)] = "{}.{}".format(section, page)
+    for i in range(50):
+        prefixes["/section%d/" % i] = "section%d" % i
+    return prefixes
+
+
+def linear_resolve(ordered, path):
+    for prefix, item in ordered:
+        if path.startswith(prefix):
+            return item
+    return None
+
+
+def main():
+    prefixes = build_prefixes()
+    rng = random.Random(0)
+    paths = [
+        "/section{}/page{}/detail/{}/".format(
+            rng.randrange(50), rng.randrange(PREFIXES // 50 + 10), i
+        )
+        for i in range(100)
+    ]
+
+    start = time.perf_counter()
+    resolver = PathResolver(prefixes)
+    build = time.perf_counter() - start
+
+    ordered = sorted(prefixes.items(), key=lambda pair: -len(pair[0]))
+    for path in paths:
+        assert resolver.resolve(path) == linear_resolve(ordered, path)
+
+    trie = best_time(lambda: [resolver.resolve(path) for path in paths], 100)
+    linear = best_time(lambda: [linear_resolve(ordered, p) for p in paths], 1, 3)
+    print("{} prefixes, built in {:.1f} ms".format(len(resolver), build * 1e3))
+    print("  linear scan: {:10.2f} us/lookup".format(linear / len(paths) * 1e6))
+    print("  prefix trie: {:10.2f} us/lookup".format(trie / len(paths) * 1e6))
+    print("  speedup:     {:10.0f}x".format(linear / trie))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,3 @@
+from django_navtag.active import get_active, reset_active, set_active
+
+__all__ = ["get_active", "reset_active", "set_active"]
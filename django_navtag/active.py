@@ -0,0 +1,39 @@
+"""
+The active nav item for the current request or task, outside of any template
+context.
+"""
+
+import contextvars
+
+from django.core.signals import request_started
+
+_active = contextvars.ContextVar("django_navtag.active", default=None)
+
+
+def set_active(item):
+    """
+    Set the active nav item (such as ``"products.phones"``) for the current
+    thread or asyncio task, or clear it with ``None``.
+
+    Templates then render as if the base ``nav`` variable had been set to this
+    item, before any ``{% nav %}`` tags. Returns a token for ``reset_active()``.
+    """
+    return _active.set(None if item is None else str(item))
+
+
+def get_active():
+    """The active nav item for the current thread or asyncio task, or ``None``"""
+    return _active.get()
+
+
+def reset_active(token):
+    """Restore the active nav item from before a ``set_active()`` call"""
+    _active.reset(token)
+
+
+def _reset_on_request(**kwargs):
+    # Worker threads are reused, so each request starts with nothing active.
+    _active.set(None)
+
+
+request_started.connect(_reset_on_request)
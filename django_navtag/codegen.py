@@ -0,0 +1,119 @@
+"""
+Compile menus into specialised Python render functions.
+
+Everything about a menu's markup that doesn't depend on the active nav path
+(URLs, labels and list markup) is joined into string constants ahead of time.
+The generated function just appends those constants to a list, choosing
+between the active and inactive fragment of each item by checking whether its
+index is in the set of active items.
+"""
+
+from types import MappingProxyType
+
+from django.utils.html import conditional_escape
+
+NO_BADGES = MappingProxyType({})
+
+
+class _Writer(object):
+    def __init__(self):
+        self.lines = []
+        self.indent = 1
+        self.pending = []
+        self.badges = False
+
+    def static(self, text):
+        self.pending.append(text)
+
+    def flush(self):
+        if self.pending:
+            self.line("append({!r})".format("".join(self.pending)))
+            self.pending = []
+
+    def line(self, code):
+        self.lines.append("    " * self.indent + code)
+
+    def statement(self, code):
+        self.flush()
+        self.line(code)
+
+    def block(self, code):
+        self.statement(code)
+        self.indent += 1
+
+    def end_block(self):
+        self.flush()
+        self.indent -= 1
+
+
+def _fragments(item, url, inactive):
+    """The active (split around the nav text) and inactive markup of an item"""
+    label = conditional_escape(item.label)
+    url = conditional_escape(url)
+    active = ('<a href="{}"'.format(url), ">{}</a>".format(label))
+    if inactive == "link":
+        return active, '<a href="{}">{}</a>'.format(url, label)
+    if inactive == "span":
+        return active, "<span>{}</span>".format(label)
+    return active, None
+
+
+def _write_list(items, urls, inactive, hidden, writer):
+    writer.static("<ul>")
+    for item in items:
+        if item.index in hidden:
+            continue
+        (start, end), other = _fragments(item, urls[item.index], inactive)
+        if other is None:
+            writer.block("if {} in active:".format(item.index))
+            writer.static("<li>" + start)
+            writer.statement("append(nav_text)")
+            writer.static(end)
+        else:
+            writer.static("<li>")
+            writer.statement(
+                "append({!r} + nav_text + {!r} if {} in active else {!r})".format(
+                    start, end, item.index, other
+                )
+            )
+        if item.badge is not None:
+            writer.badges = True
+            writer.statement("append(badges.get({}, ''))".format(item.index))
+        if item.children:
+            _write_list(item.children, urls, inactive, hidden, writer)
+        writer.static("</li>")
+        if other is None:
+            writer.end_block()
+    writer.static("</ul>")
+
+
+def menu_source(roots, urls, inactive="span", hidden=frozenset()):
+    """Generate the source of the render function for a menu's items"""
+    writer = _Writer()
+    _write_list(roots, urls, inactive, hidden, writer)
+    writer.flush()
+    args = "active, nav_text, badges=NO_BADGES" if writer.badges else "active, nav_text"
+    return "\n".join(
+        ["def render({}):".format(args), "    parts = []", "    append = parts.append"]
+        + writer.lines
+        + ['    return "".join(parts)', ""]
+    )
+
+
+def compile_menu(roots, urls, inactive="span", name="menu", hidden=frozenset()):
+    """
+    Compile a menu into a ``render(active, nav_text)`` function.
+
+    ``urls`` holds the URL of each item by index, and ``active`` (passed when
+    rendering) is the set of indexes of the active items. Items whose indexes
+    are in ``hidden`` (and their children) are left out.
+
+    For menus with badges, the function also takes a dict of badge markup by
+    item index, which is added after each item's link.
+    """
+    source = menu_source(roots, urls, inactive, hidden)
+    namespace = {"NO_BADGES": NO_BADGES}
+    exec(compile(source, "<navtag menu {}>".format(name), "exec"), namespace)
+    render = namespace["render"]
+    render.source = source
+    return render
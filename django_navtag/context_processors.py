@@ -0,0 +1,19 @@
+from django.utils.encoding import smart_str
+
+from django_navtag.templatetags.navtag import Nav, intern_path
+from django_navtag.views import get_nav_item
+
+
+def nav(request):
+    """
+    Adds a ``nav`` variable, already set to the request's active nav item.
+
+    The item comes from the ``django_navtag.views.nav`` decorator, ``NavMixin``
+    or the ``NAVTAG_VIEWS`` setting. Since it is set first, any ``{% nav %}``
+    tags in the templates leave it as it is (``{% nav text %}`` still works).
+    """
+    nav = Nav()
+    item = get_nav_item(request)
+    if item is not None:
+        nav._activate(intern_path(smart_str(item)))
+    return {"nav": nav}
@@ -0,0 +1,5 @@
+"""
+Database-backed menus. Add ``"django_navtag.db"`` to ``INSTALLED_APPS`` (and run
+``migrate``) to have ``{% navmenu %}`` use them for any menu name not
+registered or defined in the ``NAVTAG_MENUS`` setting.
+"""
@@ -0,0 +1,8 @@
+from django.apps import AppConfig
+
+
+class NavtagDBConfig(AppConfig):
+    name = "django_navtag.db"
+    label = "navtag_db"
+    verbose_name = "Navigation menus"
+    default_auto_field = "django.db.models.AutoField"
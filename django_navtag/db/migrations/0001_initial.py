@@ -0,0 +1,73 @@
+# Generated by Django 5.2.18 on 2026-10-17 02:03
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    initial = True
+
+    dependencies = []
+
+    operations = [
+        migrations.CreateModel(
+            name="Menu",
+            fields=[
+                (
+                    "id",
+                    models.AutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("name", models.SlugField(max_length=100, unique=True)),
+            ],
+            options={
+                "ordering": ("name",),
+            },
+        ),
+        migrations.CreateModel(
+            name="MenuItem",
+            fields=[
+                (
+                    "id",
+                    models.AutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "path",
+                    models.CharField(
+                        help_text="The dotted nav path, e.g. products.phones. Items are nested under the item with the longest matching parent path.",
+                        max_length=255,
+                    ),
+                ),
+                (
+                    "url",
+                    models.CharField(
+                        help_text="A URL name to reverse, or a URL containing a /.",
+                        max_length=255,
+                    ),
+                ),
+                ("label", models.CharField(max_length=100)),
+                ("order", models.IntegerField(default=0)),
+                (
+                    "menu",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="items",
+                        to="navtag_db.menu",
+                    ),
+                ),
+            ],
+            options={
+                "ordering": ("menu", "order", "path"),
+                "unique_together": {("menu", "path")},
+            },
+        ),
+    ]
@@ -0,0 +1,167 @@
+"""
+The models of database-backed menus, and loading them into cached menus.
+"""
+
+import uuid
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import models
+from django.db.models.signals import post_delete, post_save
+
+from django_navtag.trees import MenuTree
+
+# Cache key holding the current version of every database menu.
+VERSION_KEY = "django_navtag.menus.version"
+
+# The version used when the cache doesn't store anything (such as DummyCache),
+# which only changes for edits made by this process.
+_local_version = uuid.uuid4().hex
+
+
+class Menu(models.Model):
+    name = models.SlugField(max_length=100, unique=True)
+
+    class Meta:
+        ordering = ("name",)
+
+    def __str__(self):
+        return self.name
+
+
+class MenuItem(models.Model):
+    menu = models.ForeignKey(Menu, related_name="items", on_delete=models.CASCADE)
+    path = models.CharField(
+        max_length=255,
+        help_text=(
+            "The dotted nav path, e.g. products.phones. Items are nested under "
+            "the item with the longest matching parent path."
+        ),
+    )
+    url = models.CharField(
+        max_length=255, help_text="A URL name to reverse, or a URL containing a /."
+    )
+    label = models.CharField(max_length=100)
+    order = models.IntegerField(default=0)
+
+    class Meta:
+        ordering = ("menu", "order", "path")
+        unique_together = (("menu", "path"),)
+
+    def __str__(self):
+        return self.path
+
+
+def _cache():
+    return caches[getattr(settings, "NAVTAG_CACHE", None) or "default"]
+
+
+def load_menu_data(name):
+    """
+    Load a menu's items from the database with a single query.
+
+    Returns a ``MenuTree`` (or ``None`` if there is no menu with this name).
+    """
+    rows = list(
+        MenuItem.objects.filter(menu__name=name)
+        .order_by("order", "path")
+        .values_list("path", "url", "label")
+    )
+    if not rows:
+        if not Menu.objects.filter(name=name).exists():
+            return None
+        return MenuTree((), (), (), ())
+    by_path = {row[0]: i for i, row in enumerate(rows)}
+    children = {}
+    for i, row in enumerate(rows):
+        parent = row[0]
+        while "." in parent:
+            parent = parent.rsplit(".", 1)[0]
+            if parent in by_path:
+                children.setdefault(by_path[parent], []).append(i)
+                break
+        else:
+            children.setdefault(-1, []).append(i)
+    paths, urls, labels, parents = [], [], [], []
+
+    def add(row_index, parent):
+        path, url, label = rows[row_index]
+        index = len(paths)
+        paths.append(path)
+        urls.append(url)
+        labels.append(label)
+        parents.append(parent)
+        for child in children.get(row_index, ()):
+            add(child, index)
+
+    for row_index in children.get(-1, ()):
+        add(row_index, -1)
+    return MenuTree(paths, urls, labels, parents)
+
+
+def build_menu(name, tree):
+    """Build a renderable ``django_navtag.menus.Menu`` from a ``MenuTree``"""
+    from django_navtag.menus import Menu as NavMenu, MenuItem as NavMenuItem
+
+    items = []
+    roots = []
+    for i, parent in enumerate(tree.parents):
+        item = NavMenuItem(tree.path(i), tree.urls[i], tree.labels[i])
+        items.append(item)
+        if parent < 0:
+            roots.append(item)
+        else:
+            items[parent].children.append(item)
+    return NavMenu(name, roots)
+
+
+def get_version():
+    """The current version of the database menus, shared by all processes"""
+    cache = _cache()
+    version = cache.get(VERSION_KEY)
+    if version is None:
+        cache.add(VERSION_KEY, uuid.uuid4().hex, None)
+        version = cache.get(VERSION_KEY)
+        if version is None:
+            return _local_version
+    return version
+
+
+def invalidate_menus(**kwargs):
+    """Drop every cached database menu, in every process"""
+    global _local_version
+    _local_version = uuid.uuid4().hex
+    _cache().set(VERSION_KEY, uuid.uuid4().hex, None)
+
+
+_loaded = {}
+
+
+def get_db_menu(name):
+    """
+    Get a database menu, or ``None`` if there is none with this name.
+
+    The loaded ``MenuTree`` is kept in the shared cache under a key including the menu
+    version, and each process also keeps its built menus until the version
+    changes. Saving or deleting any menu or item changes the version.
+    """
+    version = get_version()
+    loaded = _loaded.get(name)
+    if loaded is not None and loaded[0] == version:
+        return loaded[1]
+    cache = _cache()
+    key = "django_navtag.menus.{}.{}".format(version, name)
+    tree = cache.get(key)
+    if tree is None:
+        tree = load_menu_data(name)
+        if tree is None:
+            return None
+        cache.set(key, tree)
+    menu = build_menu(name, tree)
+    _loaded[name] = (version, menu)
+    return menu
+
+
+for model in (Menu, MenuItem):
+    post_save.connect(invalidate_menus, sender=model)
+    post_delete.connect(invalidate_menus, sender=model)
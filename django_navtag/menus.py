@@ -0,0 +1,572 @@
+"""
+Menus defined in Python rather than as a list of ``{% navlink %}`` tags.
+
+Menus come from the ``NAVTAG_MENUS`` setting (or are added with ``register()``)
+and are rendered in one go with the ``{% navmenu %}`` template tag.
+"""
+
+import itertools
+
+from django.apps import apps
+from django.conf import settings
+from django.core.cache import caches
+from django.core.exceptions import ImproperlyConfigured
+from django.core.signals import setting_changed
+from django.urls import get_resolver, get_script_prefix, get_urlconf, reverse
+from django.utils.html import conditional_escape
+from django.utils.module_loading import import_string
+from django.utils.translation import get_language
+
+from django_navtag.codegen import _fragments, compile_menu
+from django_navtag.templatetags.navtag import intern_path
+from django_navtag.utils import LRUCache
+
+
+class MenuItem(object):
+    """
+    A single menu entry: a nav path, a URL name and a label.
+
+    ``permissions`` lists the permissions a user needs to see the item (and
+    its children), and ``visible`` is an optional predicate taking the request
+    (or the dotted path of one).
+
+    ``badge`` is an optional badge provider (or its dotted path), see
+    ``get_badges()``.
+    """
+
+    def __init__(
+        self,
+        path,
+        url_name,
+        label,
+        children=(),
+        permissions=(),
+        visible=None,
+        badge=None,
+    ):
+        if not path:
+            raise ImproperlyConfigured("Menu items require a nav path")
+        self.path = intern_path(path)
+        self.url_name = url_name
+        self.label = label
+        self.children = [_make_item(child) for child in children]
+        if isinstance(permissions, str):
+            permissions = (permissions,)
+        self.permissions = frozenset(permissions)
+        if isinstance(visible, str):
+            visible = import_string(visible)
+        self.visible = visible
+        if isinstance(badge, str):
+            badge = import_string(badge)
+        self.badge = badge
+        # Set once the item is added to a menu.
+        self.index = None
+        self.parent = None
+        self.depth = 0
+
+    @property
+    def dotted_path(self):
+        return ".".join(self.path)
+
+    def __repr__(self):
+        return "<MenuItem {}>".format(self.dotted_path)
+
+
+def _make_item(item):
+    if isinstance(item, MenuItem):
+        return item
+    try:
+        if isinstance(item, dict):
+            return MenuItem(**item)
+        return MenuItem(*item)
+    except TypeError:
+        raise ImproperlyConfigured(
+            "Menu items must be (nav path, url name, label[, children]) or a "
+            "dict of MenuItem arguments, not {!r}".format(item)
+        )
+
+
+class _TrieNode(object):
+    __slots__ = ("items", "children")
+
+    def __init__(self):
+        self.items = []
+        self.children = {}
+
+
+class Menu(object):
+    """
+    A tree of menu items.
+
+    The items are flattened (depth first) into ``items`` and indexed by nav
+    path in a prefix trie, so finding which items are active only takes one
+    walk along the active path.
+    """
+
+    def __init__(self, name, items, prerender=False):
+        self.name = name
+        self.prerender = prerender
+        self.roots = [_make_item(item) for item in items]
+        self.items = []
+        self.trie = _TrieNode()
+        self._urls = LRUCache(maxsize=32)
+        for item in self.roots:
+            self._add(item, None)
+        self.restricted = any(
+            item.permissions or item.visible is not None for item in self.items
+        )
+        self.badged = any(item.badge is not None for item in self.items)
+        self.digest = hash(
+            tuple(
+                (
+                    item.path,
+                    item.url_name,
+                    str(item.label),
+                    item.depth,
+                    item.badge is not None,
+                )
+                for item in self.items
+            )
+        )
+
+    def _add(self, item, parent):
+        item.index = len(self.items)
+        item.parent = parent
+        item.depth = 0 if parent is None else parent.depth + 1
+        self.items.append(item)
+        node = self.trie
+        for part in item.path:
+            node = node.children.setdefault(part, _TrieNode())
+        node.items.append(item.index)
+        for child in item.children:
+            self._add(child, item)
+
+    def active_items(self, path):
+        """The indexes of items matching the active path (or a parent of it)"""
+        active = set()
+        node = self.trie
+        for part in path:
+            node = node.children.get(part)
+            if node is None:
+                break
+            active.update(node.items)
+        return active
+
+    def hidden_items(self, request):
+        """
+        The indexes of the items hidden from a request (including the
+        descendants of hidden items).
+
+        Permissions are fetched once per request and each item's ``visible``
+        predicate is called at most once, with the results kept on the request.
+        Without a request, every item with permissions or a predicate is hidden.
+        """
+        if not self.restricted:
+            return frozenset()
+        if request is None:
+            return self._find_hidden(None, None)
+        memo = request.__dict__.setdefault("_navtag_hidden", {})
+        hidden = memo.get(self)
+        if hidden is None:
+            hidden = memo[self] = self._find_hidden(request, _permissions(request))
+        return hidden
+
+    def _find_hidden(self, request, permissions):
+        hidden = set()
+        for item in self.items:
+            if item.parent is not None and item.parent.index in hidden:
+                hidden.add(item.index)
+            elif item.permissions and (
+                permissions is None
+                or (permissions is not ALL and not item.permissions <= permissions)
+            ):
+                hidden.add(item.index)
+            elif item.visible is not None and (
+                request is None or not item.visible(request)
+            ):
+                hidden.add(item.index)
+        return frozenset(hidden)
+
+    def get_urls(self, current_app=None, hidden=frozenset()):
+        """
+        The URL of each item, reversed once per urlconf, script prefix and
+        language. Hidden items are never reversed, and have no URL.
+        """
+        key = (
+            get_resolver(get_urlconf()),
+            get_script_prefix(),
+            get_language(),
+            current_app,
+            hidden,
+        )
+        urls = self._urls.get(key)
+        if urls is None:
+            urls = tuple(
+                None if item.index in hidden else self._reverse(item, current_app)
+                for item in self.items
+            )
+            self._urls.set(key, urls)
+        return urls
+
+    def _reverse(self, item, current_app):
+        if "/" in item.url_name:
+            return item.url_name
+        return reverse(item.url_name, current_app=current_app)
+
+    def get_renderer(self, inactive="span", current_app=None, hidden=frozenset()):
+        """
+        Get the compiled render function for this menu with these options.
+
+        Functions are cached per menu definition, options and set of hidden
+        items, along with the current urlconf, script prefix and language that
+        the URLs and labels depend on.
+        """
+        key = (
+            self.name,
+            self.digest,
+            inactive,
+            get_resolver(get_urlconf()),
+            get_script_prefix(),
+            get_language(),
+            current_app,
+            hidden,
+        )
+        renderer = _renderers.get(key)
+        if renderer is None:
+            renderer = compile_menu(
+                self.roots,
+                self.get_urls(current_app, hidden),
+                inactive,
+                name=self.name,
+                hidden=hidden,
+            )
+            renderer.prerendered = set()
+            _renderers.set(key, renderer)
+        return renderer
+
+    def render(
+        self,
+        path,
+        nav_text="",
+        inactive="span",
+        current_app=None,
+        prerender=None,
+        hidden=frozenset(),
+        request=None,
+    ):
+        """
+        Render the menu as nested ``<ul>`` lists for the given active path,
+        leaving out any ``hidden`` items (see ``hidden_items()``).
+
+        With ``prerender`` (which defaults to the menu's own setting) the first
+        render renders the possible variants of the menu (as many as fit in the
+        variant cache), and later renders just look the right one up. Menus with badges (which need the
+        ``request``) are never pre-rendered.
+        """
+        renderer = self.get_renderer(inactive, current_app, hidden)
+        active = frozenset(self.active_items(path))
+        if self.badged:
+            rendered = self.rendered_items(active, hidden, inactive)
+            badges = self.get_badges(request, rendered)
+            return renderer(active, nav_text, badges)
+        if prerender is None:
+            prerender = self.prerender
+        if not prerender or not variants.maxsize:
+            return renderer(active, nav_text)
+        if nav_text not in renderer.prerendered:
+            renderer.prerendered.add(nav_text)
+            # More variants than fit would only evict each other, so the rest
+            # are rendered when first needed.
+            for variant in itertools.islice(self.active_variants(), variants.maxsize):
+                variants.set((renderer, nav_text, variant), renderer(variant, nav_text))
+        key = (renderer, nav_text, active)
+        content = variants.get(key)
+        if content is None:
+            # The variant has been evicted since it was pre-rendered.
+            content = renderer(active, nav_text)
+            variants.set(key, content)
+        return content
+
+    def find(self, path):
+        """The first item with a nav path (a tuple of components), or ``None``"""
+        node = self.trie
+        for part in path:
+            node = node.children.get(part)
+            if node is None:
+                return None
+        return self.items[node.items[0]] if node.items else None
+
+    def render_branch(
+        self,
+        path,
+        nav_text="",
+        inactive="span",
+        current_app=None,
+        hidden=frozenset(),
+        request=None,
+    ):
+        """
+        Render only the active branch of the menu for the given active path.
+
+        The root items and the children of each active item are rendered, but
+        no other descendants. Items with unrendered children get a
+        ``data-nav-subtree`` attribute holding their nav path, which can be
+        used to fetch them from the ``menu_subtree`` view.
+
+        The cost depends on the depth of the active path and the number of
+        items at each level, not the size of the menu.
+        """
+        active = self.active_items(path)
+        urls = self.get_urls(current_app, hidden)
+        badges = {}
+        if self.badged:
+            rendered = self.rendered_items(active, hidden, inactive, branch=True)
+            badges = self.get_badges(request, rendered)
+        parts = []
+        self._render_list(
+            self.roots, active, nav_text, inactive, urls, hidden, badges, parts
+        )
+        return "".join(parts)
+
+    def render_subtree(
+        self,
+        item,
+        inactive="span",
+        current_app=None,
+        hidden=frozenset(),
+        request=None,
+    ):
+        """
+        Render the (collapsed) children of an item, as left out by
+        ``render_branch()``.
+
+        Fragments are cached per subtree, along with the menu definition and
+        everything else the URLs depend on (unless the menu has badges).
+        """
+        if self.badged:
+            rendered = self._rendered(item.children, (), hidden, inactive, True, [])
+            return self._render_subtree(
+                item, inactive, current_app, hidden, self.get_badges(request, rendered)
+            )
+        key = (
+            self.name,
+            self.digest,
+            item.index,
+            inactive,
+            get_resolver(get_urlconf()),
+            get_script_prefix(),
+            get_language(),
+            current_app,
+            hidden,
+        )
+        content = subtrees.get(key)
+        if content is None:
+            content = self._render_subtree(item, inactive, current_app, hidden, {})
+            subtrees.set(key, content)
+        return content
+
+    def _render_subtree(self, item, inactive, current_app, hidden, badges):
+        parts = []
+        urls = self.get_urls(current_app, hidden)
+        self._render_list(item.children, (), "", inactive, urls, hidden, badges, parts)
+        return "".join(parts)
+
+    def rendered_items(self, active, hidden=frozenset(), inactive="span", branch=False):
+        """The indexes of the items that render with these options"""
+        return self._rendered(self.roots, active, hidden, inactive, branch, [])
+
+    def _rendered(self, items, active, hidden, inactive, branch, found):
+        for item in items:
+            if item.index in hidden:
+                continue
+            is_active = item.index in active
+            if not is_active and inactive == "none":
+                continue
+            found.append(item.index)
+            if item.children and (is_active or not branch):
+                self._rendered(item.children, active, hidden, inactive, branch, found)
+        return found
+
+    def get_badges(self, request, indexes):
+        """
+        Get the badge markup of the given items, by index.
+
+        Each badge provider is called once with the request and the dotted nav
+        paths of all of its items, and returns a dict of nav paths to badge
+        values. Values are kept for the rest of the request, and can also be
+        cached for ``NAVTAG_BADGE_TIMEOUT`` seconds (per user). Items without a
+        (truthy) value get no badge, as do all items when there's no request.
+        """
+        if request is None:
+            return {}
+        by_provider = {}
+        for index in indexes:
+            item = self.items[index]
+            if item.badge is not None:
+                by_provider.setdefault(item.badge, []).append(item)
+        badges = {}
+        for provider, items in by_provider.items():
+            values = _badge_values(
+                request, provider, [item.dotted_path for item in items]
+            )
+            for item in items:
+                value = values.get(item.dotted_path)
+                if value:
+                    badges[item.index] = BADGE_FORMAT.format(conditional_escape(value))
+        return badges
+
+    def _render_list(
+        self, items, active, nav_text, inactive, urls, hidden, badges, parts
+    ):
+        append = parts.append
+        append("<ul>")
+        for item in items:
+            if item.index in hidden:
+                continue
+            is_active = item.index in active
+            (start, end), other = _fragments(item, urls[item.index], inactive)
+            if not is_active and other is None:
+                continue
+            if item.children and not is_active:
+                append(
+                    '<li data-nav-subtree="{}">'.format(
+                        conditional_escape(item.dotted_path)
+                    )
+                )
+            else:
+                append("<li>")
+            append(start + nav_text + end if is_active else other)
+            if item.index in badges:
+                append(badges[item.index])
+            if item.children and is_active:
+                self._render_list(
+                    item.children,
+                    active,
+                    nav_text,
+                    inactive,
+                    urls,
+                    hidden,
+                    badges,
+                    parts,
+                )
+            append("</li>")
+        append("</ul>")
+
+    def active_variants(self):
+        """Every distinct set of active items, starting with nothing active"""
+        found = {frozenset()}
+        yield frozenset()
+        for item in self.items:
+            active = frozenset(self.active_items(item.path))
+            if active not in found:
+                found.add(active)
+                yield active
+
+
+# Marks a superuser's permissions, which include everything.
+ALL = object()
+
+
+def _permissions(request):
+    """The permissions of the request's user, fetched once per request"""
+    permissions = getattr(request, "_navtag_permissions", None)
+    if permissions is None:
+        user = getattr(request, "user", None)
+        if user is None or not user.is_active:
+            permissions = frozenset()
+        elif user.is_superuser:
+            permissions = ALL
+        else:
+            permissions = frozenset(user.get_all_permissions())
+        request._navtag_permissions = permissions
+    return permissions
+
+
+# The markup added after the link of items with a badge.
+BADGE_FORMAT = '<span class="badge">{}</span>'
+
+
+def _badge_values(request, provider, paths):
+    """
+    Get badge values from a provider for some nav paths, calling it (at most)
+    once for the paths not already known for this request or cached.
+    """
+    memo = request.__dict__.setdefault("_navtag_badges", {})
+    values = memo.setdefault(provider, {})
+    missing = [path for path in paths if path not in values]
+    if not missing:
+        return values
+    timeout = getattr(settings, "NAVTAG_BADGE_TIMEOUT", 0)
+    user = getattr(request, "user", None)
+    keys = None
+    if timeout and user is not None and user.is_authenticated:
+        name = getattr(provider, "__qualname__", type(provider).__qualname__)
+        prefix = "django_navtag.badge.{}.{}.{}.".format(
+            provider.__module__, name, user.pk
+        )
+        keys = {prefix + path: path for path in missing}
+        cache = caches[getattr(settings, "NAVTAG_CACHE", None) or "default"]
+        for key, value in cache.get_many(list(keys)).items():
+            values[keys[key]] = value
+        missing = [path for path in missing if path not in values]
+    if missing:
+        fetched = provider(request, missing) or {}
+        for path in missing:
+            values[path] = fetched.get(path)
+        if keys is not None:
+            cache.set_many(
+                {key: values[path] for key, path in keys.items() if path in missing},
+                timeout,
+            )
+    return values
+
+
+# Compiled menu render functions, see ``Menu.get_renderer()``.
+_renderers = LRUCache(maxsize=64)
+
+# Collapsed subtree fragments, see ``Menu.render_subtree()``.
+subtrees = LRUCache(maxsize=256)
+
+# Pre-rendered menu variants, keyed by render function, nav text and the set
+# of active items.
+variants = LRUCache(getattr(settings, "NAVTAG_MENU_VARIANTS", 1000))
+
+_registered = {}
+_from_settings = {}
+
+
+def register(name, items, prerender=False):
+    """Register a menu (replacing any menu already using the name)"""
+    menu = _registered[name] = Menu(name, items, prerender=prerender)
+    return menu
+
+
+def get_menu(name):
+    """
+    Get a registered menu, or build it from the ``NAVTAG_MENUS`` setting (or
+    the database, with ``django_navtag.db`` installed)
+    """
+    menu = _registered.get(name) or _from_settings.get(name)
+    if menu is None:
+        menus = getattr(settings, "NAVTAG_MENUS", {})
+        if name in menus:
+            menu = _from_settings[name] = Menu(name, menus[name])
+        elif apps.is_installed("django_navtag.db"):
+            from django_navtag.db.models import get_db_menu
+
+            menu = get_db_menu(name)
+        if menu is None:
+            raise ImproperlyConfigured("No navtag menu named {!r}".format(name))
+    return menu
+
+
+def _reset_menus(setting, **kwargs):
+    if setting == "NAVTAG_MENUS":
+        _from_settings.clear()
+    elif setting == "NAVTAG_MENU_VARIANTS":
+        value = kwargs["value"]
+        variants.maxsize = 1000 if value is None else value
+        variants.clear()
+
+
+setting_changed.connect(_reset_menus)
@@ -0,0 +1,68 @@
+import html
+import json
+import re
+
+from django_navtag.templatetags.navtag import (
+    _split_path,
+    compile_pattern,
+    nav_text_attribute,
+)
+
+MARKER_RE = re.compile(r"<!--navtag:(.*?)-->")
+NAV_PATH_RE = re.compile(r' data-nav-path="([^"]*)"')
+
+
+def mark_active(content, states):
+    """
+    Add the nav text to each ``data-nav-path`` link matching the given states.
+
+    ``states`` maps nav variable names to ``(path, text)`` tuples.
+    """
+    states = {
+        var_name: (_split_path(path), nav_text_attribute(text))
+        for var_name, (path, text) in states.items()
+    }
+
+    def replace(match):
+        matcher = compile_pattern(html.unescape(match.group(1)), navlink=True)
+        state = states.get(matcher.var_name)
+        if state and state[1] and matcher.matches(state[0]):
+            return match.group(0) + state[1]
+        return match.group(0)
+
+    return NAV_PATH_RE.sub(replace, content)
+
+
+class NavMarkupMiddleware:
+    """
+    Marks the active links of pages rendered with ``NAVTAG_STATIC_MARKUP``.
+
+    Links are rendered identically for every nav state (so the markup can be
+    cached) and the ``{% navmarker %}`` comments record the actual state for
+    this response.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        response = self.get_response(request)
+        if (
+            response.streaming
+            or response.has_header("Content-Encoding")
+            or "html" not in response.get("Content-Type", "")
+        ):
+            return response
+        if b"<!--navtag:" not in response.content:
+            return response
+        charset = response.charset
+        content = response.content.decode(charset)
+        states = {}
+        for data in MARKER_RE.findall(content):
+            state = json.loads(data)
+            states[state["var"]] = (state["path"], state["text"])
+        content = mark_active(MARKER_RE.sub("", content), states)
+        response.content = content.encode(charset)
+        if response.has_header("Content-Length"):
+            response["Content-Length"] = str(len(response.content))
+        return response
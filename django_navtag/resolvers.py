@@ -0,0 +1,88 @@
+import functools
+import sys
+
+from django.conf import settings
+from django.core.signals import setting_changed
+from django.utils.module_loading import import_string
+
+# The trie key holding a node's nav item (URL segments are always strings).
+ITEM = None
+
+
+def _segments(path):
+    return [part for part in path.split("/") if part]
+
+
+class PathResolver(object):
+    """
+    Maps URL paths to nav items by their longest matching prefix.
+
+    ``prefixes`` is a mapping (or iterable of pairs) of URL prefixes to nav
+    items, e.g. ``{"/products/phones/": "products.phones"}``. Prefixes match
+    whole path segments, so ``/products/`` matches ``/products/phones/x`` but
+    not ``/productsale/``.
+
+    The prefixes are stored in a trie of nested dicts, one level per segment, so
+    resolving a path costs the same however many prefixes there are.
+    """
+
+    def __init__(self, prefixes):
+        if hasattr(prefixes, "items"):
+            prefixes = prefixes.items()
+        self.root = {}
+        self.size = 0
+        intern = sys.intern
+        for prefix, item in prefixes:
+            node = self.root
+            for part in _segments(prefix):
+                part = intern(part)
+                child = node.get(part)
+                if child is None:
+                    child = node[part] = {}
+                node = child
+            if ITEM not in node:
+                self.size += 1
+            node[ITEM] = item
+
+    def __len__(self):
+        return self.size
+
+    def resolve(self, path):
+        """Return the nav item of the longest prefix of ``path``, or ``None``"""
+        node = self.root
+        item = node.get(ITEM)
+        for part in path.split("/"):
+            if not part:
+                continue
+            node = node.get(part)
+            if node is None:
+                break
+            item = node.get(ITEM, item)
+        return item
+
+
+@functools.lru_cache(maxsize=None)
+def get_path_resolver():
+    """
+    The resolver for the ``NAVTAG_PATH_PREFIXES`` setting, or ``None``.
+
+    The setting can be a mapping of prefixes to nav items, a callable returning
+    one, or the dotted path of such a callable. It is built once; call
+    ``get_path_resolver.cache_clear()`` after the prefixes change.
+    """
+    prefixes = getattr(settings, "NAVTAG_PATH_PREFIXES", None)
+    if prefixes is None:
+        return None
+    if isinstance(prefixes, str):
+        prefixes = import_string(prefixes)
+    if callable(prefixes):
+        prefixes = prefixes()
+    return PathResolver(prefixes)
+
+
+def _reset_path_resolver(setting, **kwargs):
+    if setting == "NAVTAG_PATH_PREFIXES":
+        get_path_resolver.cache_clear()
+
+
+setting_changed.connect(_reset_path_resolver)
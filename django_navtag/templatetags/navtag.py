@@ -1,56 +1,542 @@
+import functools
+import hashlib
+import json
+import re
+import sys
+import time
+from urllib.parse import quote, unquote
+
 from django import template
+from django.conf import settings
+from django.core.cache import caches
+from django.core.exceptions import ImproperlyConfigured
+from django.core.signals import setting_changed
+from django.template.base import Variable
+from django.urls import (
+    NoReverseMatch,
+    Resolver404,
+    get_resolver,
+    get_script_prefix,
+    get_urlconf,
+    resolve,
+    reverse,
+)
+from django.urls.converters import get_converters
 from django.utils.encoding import smart_str
+from django.utils.html import conditional_escape, escape
+from django.utils.http import RFC3986_SUBDELIMS, escape_leading_slashes
 from django.utils.safestring import mark_safe
+from django.utils.translation import get_language
+
+from django_navtag.active import get_active
+from django_navtag.utils import LRUCache
 
 register = template.Library()
 
+# The render_context key for URLs already reversed during the current render.
+URL_MEMO_KEY = "django_navtag.urls"
+
+# The key of the dict of navs by variable name, kept in the base context dict.
+NAV_REGISTRY_KEY = "_navtag"
+
+# How inactive navlinks are rendered, see ``NAVTAG_INACTIVE``.
+INACTIVE_CHOICES = ("span", "link", "none")
+
+# Process-wide cache of argument-less URLs, see ``NAVTAG_URL_CACHE_SIZE``.
+url_cache = LRUCache(getattr(settings, "NAVTAG_URL_CACHE_SIZE", 0))
+
+
+# In-process tier in front of the shared cache used by ``{% navcache %}``.
+fragment_cache = LRUCache(getattr(settings, "NAVTAG_LOCAL_CACHE_SIZE", 256))
+
+
+# Process-wide templates of URLs with arguments, see ``URLTemplate``.
+url_templates = LRUCache(256)
+
+# Marks URLs which can't be reversed from a template.
+NO_TEMPLATE = object()
+
+_ROUTE_PARAMETER_RE = re.compile(r"<(?:(?P<converter>[^>:]+):)?(?P<parameter>[^>]+)>")
+
+# Characters only found in the routes of re_path() patterns.
+_REGEX_ROUTE_RE = re.compile(r"[\^$\\()\[\]{}?*+|]")
+
+_SAFE_URL_CHARS = RFC3986_SUBDELIMS + "/~:@"
+
+
+class URLTemplate(object):
+    """
+    A reversed URL, split around the values of its arguments.
+
+    Later URLs for the same view are built by validating and quoting new
+    values with the route's converters and joining them with the fixed parts,
+    just as ``reverse()`` does after finding the route.
+    """
+
+    __slots__ = ("parts", "params", "converters")
+
+    def __init__(self, parts, params, converters):
+        self.parts = parts
+        self.params = params
+        self.converters = converters
+
+    @classmethod
+    def from_route(cls, route, prefix):
+        """Build a template from a ``path()`` route, or return ``None``"""
+        parts = []
+        params = []
+        converters = []
+        position = 0
+        for match in _ROUTE_PARAMETER_RE.finditer(route):
+            parts.append(route[position : match.start()])
+            params.append(match.group("parameter"))
+            try:
+                converters.append(get_converters()[match.group("converter") or "str"])
+            except KeyError:
+                return None
+            position = match.end()
+        parts.append(route[position:])
+        if any(_REGEX_ROUTE_RE.search(part) for part in parts):
+            return None
+        parts[0] = prefix + parts[0]
+        parts = [quote(part, safe=_SAFE_URL_CHARS) for part in parts]
+        return cls(tuple(parts), tuple(params), tuple(converters))
+
+    def substitute(self, args, kwargs):
+        """The URL for these arguments, or ``None`` if they don't fit"""
+        params = self.params
+        if args:
+            if kwargs or len(args) != len(params):
+                return None
+            values = args
+        else:
+            if len(kwargs) != len(params):
+                return None
+            try:
+                values = [kwargs[param] for param in params]
+            except KeyError:
+                return None
+        parts = self.parts
+        url = [parts[0]]
+        for i, converter in enumerate(self.converters):
+            try:
+                text = str(converter.to_url(values[i]))
+            except ValueError:
+                return None
+            if not re.fullmatch(converter.regex, text):
+                return None
+            url.append(quote(text, safe=_SAFE_URL_CHARS))
+            url.append(parts[i + 1])
+        return escape_leading_slashes("".join(url))
+
+
+def _build_url_template(view_name, url, args, kwargs):
+    """
+    Find the route of a URL reversed for ``view_name`` and build its template.
+
+    The template is only used if it reproduces the reversed URL exactly, and
+    if the view name has no other route that other arguments could reverse to.
+    """
+    prefix = get_script_prefix()
+    if not url.startswith(prefix):
+        return None
+    urlconf = get_urlconf()
+    try:
+        match = resolve("/" + unquote(url[len(prefix) :]), urlconf)
+    except Resolver404:
+        return None
+    if not match.route or match.url_name != view_name.rsplit(":", 1)[-1]:
+        return None
+    resolver = get_resolver(urlconf)
+    for namespace in match.namespaces:
+        try:
+            resolver = resolver.namespace_dict[namespace][1]
+        except KeyError:
+            return None
+    if len(resolver.reverse_dict.getlist(match.url_name)) != 1:
+        return None
+    url_template = URLTemplate.from_route(match.route, prefix)
+    if url_template is None or url_template.substitute(args, kwargs) != url:
+        return None
+    return url_template
+
+
+def _reset_url_cache(setting, **kwargs):
+    if setting == "NAVTAG_URL_CACHE_SIZE":
+        url_cache.maxsize = kwargs["value"] or 0
+        url_cache.clear()
+    elif setting == "NAVTAG_LOCAL_CACHE_SIZE":
+        fragment_cache.maxsize = 256 if kwargs["value"] is None else kwargs["value"]
+        fragment_cache.clear()
+
+
+setting_changed.connect(_reset_url_cache)
+
+
+def _find_active_path(tree):
+    """Walk a nav tree and return the first active path as a tuple"""
+    # Handle case where tree is not a dict (e.g., True for leaf nodes)
+    if not isinstance(tree, dict):
+        return ()
+    for key, value in tree.items():
+        if isinstance(value, dict):
+            path = _find_active_path(value)
+            if path:
+                return (key,) + path
+        elif value:
+            return (key,)
+    return ()
+
+
+def _build_tree(path):
+    """Build the nested nav tree for a tuple of path components"""
+    value = True
+    for part in reversed(path):
+        value = {part: value}
+    return value
+
+
+@functools.lru_cache(maxsize=1024)
+def intern_path(item):
+    """
+    Split a dotted nav item into a tuple of interned components.
+
+    The same tuple is returned each time for the same item (while it remains
+    cached), so the active paths of separate renders share their storage.
+    """
+    return tuple(sys.intern(part) for part in item.split("."))
+
+
+def _intern_components(path):
+    return tuple(sys.intern(part) if type(part) is str else part for part in path)
+
+
+@functools.lru_cache(maxsize=1024)
+def _path_details(path):
+    return ".".join(path), frozenset(path)
+
+
+def _is_constant(filter_expression):
+    """Check whether a filter expression always resolves to the same value"""
+    if filter_expression.filters:
+        return False
+    var = filter_expression.var
+    if isinstance(var, Variable):
+        return var.lookups is None and not var.translate
+    return True
+
+
+class NavMatcher(object):
+    """A nav item pattern, parsed once and matched against active paths"""
+
+    EXACT = "exact"
+    BRANCH = "branch"
+    CHILDREN = "children"
+    GLOB = "glob"
+
+    def __init__(
+        self, parent, mode=EXACT, exclude=(), var_name="nav", pattern="", glob=()
+    ):
+        self.parent = parent
+        self.mode = mode
+        self.exclude = exclude
+        self.var_name = var_name
+        self.pattern = pattern
+        # For glob patterns, the runs of components between each "**".
+        self.glob = glob
+
+    def matches(self, path):
+        """Check a tuple of active path components against this pattern"""
+        parent = self.parent
+        if self.mode == self.EXACT:
+            return path == parent
+        if self.mode == self.GLOB:
+            return self._matches_glob(path)
+        depth = len(parent)
+        if path[:depth] != parent:
+            return False
+        if self.mode == self.BRANCH:
+            return True
+        if len(path) == depth:
+            return False
+        exclude = self.exclude
+        return not exclude or path[depth : depth + len(exclude)] != exclude
+
+    def _matches_glob(self, path):
+        segments = self.glob
+        head = segments[0]
+        if len(segments) == 1:
+            return len(path) == len(head) and _matches_segment(head, path, 0)
+        tail = segments[-1]
+        start = len(head)
+        end = len(path) - len(tail)
+        if end < start:
+            return False
+        if not _matches_segment(head, path, 0):
+            return False
+        if not _matches_segment(tail, path, end):
+            return False
+        # Each "**" can swallow any number of components, so the first place
+        # each run in between fits is as good as any later one.
+        for segment in segments[1:-1]:
+            last = end - len(segment)
+            while start <= last and not _matches_segment(segment, path, start):
+                start += 1
+            if start > last:
+                return False
+            start += len(segment)
+        return True
+
+    def __repr__(self):
+        if self.mode == self.GLOB:
+            return "<NavMatcher {0} {1}>".format(self.mode, self.pattern)
+        return "<NavMatcher {0} {1}>".format(self.mode, ".".join(self.parent))
+
+
+def _matches_segment(segment, path, offset):
+    """Check a run of glob components against the path, from ``offset``"""
+    for part in segment:
+        component = path[offset]
+        offset += 1
+        if part is None:
+            continue
+        if type(part) is frozenset:
+            if component not in part:
+                return False
+        elif part != component:
+            return False
+    return True
+
+
+def _split_path(item):
+    return tuple(item.split(".")) if item else ()
+
+
+def _is_glob(pattern):
+    return "*" in pattern or "(" in pattern
+
+
+def _split_glob(pattern, navlink):
+    """
+    Split a glob pattern into the runs of components between each ``**``.
+
+    Components are strings, ``None`` for ``*`` or a frozenset of alternatives.
+    """
+    segments = [[]]
+    for part in pattern.split("."):
+        if part == "**":
+            if segments[-1] or len(segments) == 1:
+                segments.append([])
+        elif part == "*":
+            segments[-1].append(None)
+        elif part.startswith("(") and part.endswith(")"):
+            segments[-1].append(frozenset(part[1:-1].split("|")))
+        else:
+            segments[-1].append(sys.intern(part))
+    if navlink and (len(segments) == 1 or segments[-1]):
+        # Like other navlink items, descendants of a match also match.
+        segments.append([])
+    return tuple(tuple(segment) for segment in segments)
+
+
+@functools.lru_cache(maxsize=512)
+def compile_pattern(pattern, navlink=False):
+    """
+    Compile a nav pattern string into a ``NavMatcher``.
+
+    Patterns:
+    - "item" - exact match (or also any descendant when ``navlink`` is set)
+    - "item!" - children only (not exact match)
+    - "item!exclude" - children except 'exclude'
+    - "item.*.detail" - ``*`` matches any one component
+    - "item.**" - ``**`` matches any number of components (including none)
+    - "item.(orders|returns)" - any one of the alternatives
+
+    For navlinks, a ``var_name:`` prefix selects an alternate nav variable.
+    Compiled patterns are kept in a bounded LRU, and each match takes time
+    proportional to the depth of the active path.
+    """
+    full_pattern = pattern
+    var_name = "nav"
+    if navlink and ":" in pattern:
+        var_name, pattern = pattern.split(":", 1)
+    if "!" in pattern:
+        parent, exclude = pattern.split("!", 1)
+        return NavMatcher(
+            _split_path(parent),
+            NavMatcher.CHILDREN,
+            exclude=_split_path(exclude),
+            var_name=var_name,
+            pattern=full_pattern,
+        )
+    if _is_glob(pattern):
+        return NavMatcher(
+            (),
+            NavMatcher.GLOB,
+            var_name=var_name,
+            pattern=full_pattern,
+            glob=_split_glob(pattern, navlink),
+        )
+    parent = _split_path(pattern)
+    # An empty item only ever matches when nothing is active.
+    mode = NavMatcher.BRANCH if navlink and parent else NavMatcher.EXACT
+    return NavMatcher(parent, mode, var_name=var_name, pattern=full_pattern)
+
+
+class _NavState(object):
+    """
+    The state shared by a root nav and all of its sub-navs.
+
+    This holds no references back to any nav objects so that navs (and their
+    cached sub-navs) are freed by reference counting alone.
+    """
+
+    __slots__ = (
+        "path",
+        "active_path",
+        "active_path_str",
+        "active_components",
+        "text",
+        "has_text",
+    )
+
+    def __init__(self):
+        self.text = None
+        self.has_text = False
+        self.set_path(())
+
+    def set_path(self, path):
+        self.path = path
+        # An item of "" is a valid (truthy) nav which has nothing active.
+        if path == ("",):
+            path = ()
+        self.active_path = path
+        self.active_path_str, self.active_components = _path_details(path)
+
 
 class Nav(object):
-    def __init__(self, tree=None, root=None):
-        self._root = root or self
-        self._tree = tree or {}
+    """
+    The navigation state for a template context variable.
+
+    Navs set by ``{% nav %}`` only hold their active path (an interned tuple),
+    and the nested tree of items is implied by it. A tree is only kept for a
+    root nav that has been changed with ``update()``.
+    """
+
+    __slots__ = ("_state", "_tree", "_prefix", "_children")
+
+    def __init__(self, tree=None, state=None, prefix=()):
+        self._prefix = prefix
+        self._children = None
+        if state is None:
+            state = _NavState()
+            if tree:
+                state.set_path(_intern_components(_find_active_path(tree)))
+            else:
+                tree = None
+        self._state = state
+        self._tree = tree
 
     def __getitem__(self, key):
-        return Nav(self._tree[key], root=self._root)
+        children = self._children
+        if children is not None:
+            child = children.get(key)
+            if child is not None:
+                return child
+        tree = self._tree
+        depth = len(self._prefix)
+        if tree is None:
+            path = self._state.path
+            if depth >= len(path) or path[depth] != key:
+                return self._missing(key)
+            child = Nav(None, state=self._state, prefix=path[: depth + 1])
+        elif isinstance(tree, dict) and key in tree:
+            prefix = self._prefix + (key,)
+            child = Nav(tree[key] or {}, state=self._state, prefix=prefix)
+        else:
+            return self._missing(key)
+        if children is None:
+            children = self._children = {}
+        children[key] = child
+        return child
+
+    def _missing(self, key):
+        if isinstance(key, str) and hasattr(type(self), key):
+            # Let template variable resolution go on to the attribute.
+            raise KeyError(key)
+        # Otherwise return rather than raise so it doesn't go on to try
+        # attribute and index lookups.
+        return MISSING
 
     def __str__(self):
         return mark_safe(str(self._text))
 
     def __bool__(self):
+        if self._tree is None:
+            # Sub-navs of an implied tree only exist along the active path.
+            return bool(self._prefix or self._state.path)
         return bool(self._tree)
 
     def _get_text(self):
-        if hasattr(self._root, "_text_value"):
-            return self._root._text_value
-        return self._tree
+        if self._state.has_text:
+            return self._state.text
+        return self._get_tree()
 
     def _set_text(self, value):
-        self._root._text_value = value
+        self._state.text = value
+        self._state.has_text = True
 
     _text = property(_get_text, _set_text)
 
+    def _get_tree(self):
+        """The tree of items below this nav, built from the path if implied"""
+        tree = self._tree
+        if tree is not None:
+            return tree
+        path = self._state.path[len(self._prefix) :]
+        if not path and not self._prefix:
+            return {}
+        return _build_tree(path)
+
+    def _activate(self, path, tree=None):
+        """Set the active path, along with the tree it came from (if any)"""
+        self._check_root()
+        self._tree = tree
+        self._children = None
+        self._state.set_path(path)
+
+    def _check_root(self):
+        if self._prefix:
+            raise TypeError(
+                "Sub-navigation is read-only, change the root nav object instead"
+            )
+
+    def _get_path(self):
+        """The active path components, relative to this nav"""
+        path = self._state.active_path
+        prefix = self._prefix
+        if not prefix:
+            return path
+        offset = len(prefix)
+        if path[:offset] == prefix:
+            return path[offset:]
+        # This sub-nav is on a different branch to the root's active path.
+        return _find_active_path(self._get_tree())
+
     def clear(self):
-        self._tree = {}
+        self._activate(())
 
     def update(self, *args, **kwargs):
-        self._tree.update(*args, **kwargs)
+        self._check_root()
+        tree = self._get_tree()
+        tree.update(*args, **kwargs)
+        self._activate(_intern_components(_find_active_path(tree)), tree)
 
-    def get_active_path(self, path=""):
+    def get_active_path(self):
         """Get the dotted path of the active navigation item"""
-        # Handle case where _tree is not a dict (e.g., True for leaf nodes)
-        if not isinstance(self._tree, dict):
-            return ""
-        for key, value in self._tree.items():
-            current_path = path + "." + key if path else key
-            if isinstance(value, dict):
-                # Recurse into nested nav
-                sub_nav = Nav(value, root=self._root)
-                result = sub_nav.get_active_path(current_path)
-                if result:
-                    return result
-            elif value:
-                return current_path
-        return ""
+        if not self._prefix:
+            return self._state.active_path_str
+        return ".".join(self._get_path())
 
     def __eq__(self, other):
         """Check if the active navigation path matches the given pattern
@@ -59,73 +545,125 @@ class Nav(object):
         - "item" - exact match
         - "item!" - children only (not exact match)
         - "item!exclude" - children except 'exclude'
+        - "item.*.detail" - ``*`` matches any one component
+        - "item.**" - ``**`` matches any number of components (including none)
+        - "item.(orders|returns)" - any one of the alternatives
         """
         if isinstance(other, str):
-            active_path = self.get_active_path()
-
-            if "!" in other:
-                parts = other.split("!", 1)
-                parent = parts[0]
-                exclude = parts[1] if len(parts) > 1 and parts[1] else None
-
-                if exclude:
-                    # Pattern like 'courses!list' - match children except specific ones
-                    return (
-                        active_path.startswith(parent + ".")
-                        and active_path != parent
-                        and not active_path.startswith(parent + "." + exclude)
-                    )
-                else:
-                    # Pattern like 'courses!' - match children only, not exact
-                    return (
-                        active_path.startswith(parent + ".") and active_path != parent
-                    )
-            else:
-                # Normal pattern - exact match
-                return active_path == other
+            return compile_pattern(other).matches(self._get_path())
         elif isinstance(other, Nav):
-            return self.get_active_path() == other.get_active_path()
+            return self._get_path() == other._get_path()
         return False
 
     def __contains__(self, item):
         """Check if a component is part of the active navigation path"""
         if isinstance(item, str):
-            active_path = self.get_active_path()
-            if not active_path:
-                return False
-            # Check if the component matches any part of the path
-            components = active_path.split(".")
-            return item in components
+            if not self._prefix:
+                return item in self._state.active_components
+            return item in self._get_path()
         return False
 
     def __iter__(self):
         """Iterate over the active path components"""
-        active_path = self.get_active_path()
-        if active_path:
-            for part in active_path.split("."):
-                yield part
+        return iter(self._get_path())
+
+
+class _MissingNav(Nav):
+    """The falsy sub-navigation returned for any item that isn't in a nav"""
+
+    __slots__ = ()
+
+    def __getitem__(self, key):
+        return self._missing(key)
+
+    def __str__(self):
+        return ""
+
+    def __eq__(self, other):
+        return False
+
+    def __contains__(self, item):
+        return False
+
+    def _get_path(self):
+        return ()
+
+    def _check_root(self):
+        raise TypeError("Missing sub-navigation is read-only")
+
+
+MISSING = _MissingNav()
+
+
+def get_nav(context, var_name="nav"):
+    """
+    Get the ``Nav`` for a variable name, or ``None``.
+
+    Navs are kept in a registry in the base context dict, so they are found in
+    one lookup however deep the context stack is. Navs set by ``{% nav %}``
+    are added to it straight away. Otherwise the first lookup searches the
+    context, for a nav passed to the template or from the
+    ``django_navtag.context_processors.nav`` context processor, and records
+    what it found. If that has nothing active, ``nav`` is activated with the
+    item from ``django_navtag.set_active()``.
+    """
+    base = context.dicts[0]
+    navs = base.get(NAV_REGISTRY_KEY)
+    if navs is not None and var_name in navs:
+        return navs[var_name]
+    nav = context.get(var_name)
+    if not isinstance(nav, Nav):
+        nav = None
+    created = False
+    if not nav and var_name == "nav":
+        item = get_active()
+        if item is not None:
+            if nav is None:
+                nav = Nav()
+                created = True
+            nav._activate(intern_path(item))
+    # Copy the stack to avoid leaking into other contexts.
+    base = base.copy()
+    base[NAV_REGISTRY_KEY] = dict(navs or ())
+    base[NAV_REGISTRY_KEY][var_name] = nav
+    if created:
+        base[var_name] = nav
+    context.dicts[0] = base
+    return nav
 
 
 class NavNode(template.Node):
-    def __init__(self, item=None, var_for=None, var_text=None):
+    def __init__(self, item=None, var_for=None, var_text=None, active=None):
         self.item = item
+        self.active = active
         self.var_name = var_for or "nav"
         self.text = var_text
 
     def render(self, context):
         first_context_stack = context.dicts[0]
-        nav = first_context_stack.get(self.var_name)
-        if nav is not context.get(self.var_name):
-            raise template.TemplateSyntaxError(
-                "'{0}' variable has been altered in current context".format(
-                    self.var_name
+        navs = first_context_stack.get(NAV_REGISTRY_KEY) or {}
+        nav = navs.get(self.var_name)
+        current = context.get(self.var_name)
+        if nav is not current:
+            if nav is not None or not isinstance(current, Nav) or current._prefix:
+                raise template.TemplateSyntaxError(
+                    "'{0}' variable has been altered in current context".format(
+                        self.var_name
+                    )
                 )
-            )
+            # A nav installed for the request (by the context processor) is
+            # moved to the base of the context, as if set by a previous tag.
+            nav = None
 
         if not isinstance(nav, Nav):
-            nav = Nav()
+            nav = current if isinstance(current, Nav) else Nav()
+            active = get_active() if self.var_name == "nav" else None
+            if active is not None and not nav:
+                nav._activate(intern_path(active))
             # Copy the stack to avoid leaking into other contexts.
             new_first_context_stack = first_context_stack.copy()
+            new_first_context_stack[NAV_REGISTRY_KEY] = dict(navs)
+            new_first_context_stack[NAV_REGISTRY_KEY][self.var_name] = nav
             new_first_context_stack[self.var_name] = nav
             context.dicts[0] = new_first_context_stack
 
@@ -141,18 +679,13 @@ class NavNode(template.Node):
             # If the nav variable is already set, don't do anything.
             return ""
 
+        if self.active:
+            nav._activate(self.active)
+            return ""
+
         item = self.item.resolve(context)
         item = item and smart_str(item)
-        value = True
-        if not item:
-            item = ""
-        for part in reversed(item.split(".")):
-            new_item = {}
-            new_item[part] = value
-            value = new_item
-
-        nav.clear()
-        nav.update(new_item)
+        nav._activate(intern_path(item or ""))
         return ""
 
     def __repr__(self):
@@ -228,6 +761,11 @@ def nav(parser, token):
         {% if nav == "products!" %}         {# True if any child of products is active #}
         {% if nav == "products!list" %}     {# True if child of products except 'list' #}
 
+        {# Glob matching #}
+        {% if nav == "products.*.detail" %} {# True for the detail of any product #}
+        {% if nav == "products.**" %}       {# True for products or anything below #}
+        {% if nav == "account.(orders|returns)" %}  {# True for either item #}
+
         {# Component checking with 'in' #}
         {% if "products" in nav %}          {# True if active path contains "products" #}
         {% if "phones" in nav %}            {# True if active path contains "phones" #}
@@ -263,6 +801,10 @@ def nav(parser, token):
         # Text argument doesn't expect an item.
         ok = "text" not in node_kwargs
         item = parser.compile_filter(bits[1])
+        if _is_constant(item):
+            # Literal items never change, so build their path just the once.
+            value = item.resolve({})
+            node_kwargs["active"] = intern_path(value and smart_str(value) or "")
     else:
         item = None
 
@@ -272,61 +814,243 @@ def nav(parser, token):
     return NavNode(item, **node_kwargs)
 
 
+def _current_app(context):
+    # Matches how the {% url %} tag finds the current application.
+    try:
+        return context.request.current_app
+    except AttributeError:
+        try:
+            return context.request.resolver_match.namespace
+        except AttributeError:
+            return None
+
+
+def nav_text_attribute(text):
+    """Turn a nav text value into the attribute text added to active links"""
+    if not text:
+        return ""
+    if "=" not in text:
+        text = ' class="{}"'.format(text.strip())
+    return text
+
+
+def _nav_text(nav):
+    if not isinstance(nav, Nav):
+        return ""
+    return nav_text_attribute(nav._state.text)
+
+
+# The checked NAVTAG_INACTIVE setting, read when first needed.
+_inactive = None
+
+
+def _inactive_mode():
+    global _inactive
+    inactive = _inactive
+    if inactive is None:
+        inactive = getattr(settings, "NAVTAG_INACTIVE", "span")
+        if inactive not in INACTIVE_CHOICES:
+            raise ImproperlyConfigured(
+                "NAVTAG_INACTIVE must be one of: {}".format(", ".join(INACTIVE_CHOICES))
+            )
+        _inactive = inactive
+    return inactive
+
+
+# The NAVTAG_STATIC_MARKUP setting, read when first needed.
+_static_markup = None
+
+
+def _use_static_markup():
+    global _static_markup
+    if _static_markup is None:
+        _static_markup = bool(getattr(settings, "NAVTAG_STATIC_MARKUP", False))
+    return _static_markup
+
+
+def _reset_render_settings(setting, **kwargs):
+    global _inactive, _static_markup
+    if setting == "NAVTAG_INACTIVE":
+        _inactive = None
+    elif setting == "NAVTAG_STATIC_MARKUP":
+        _static_markup = None
+
+
+setting_changed.connect(_reset_render_settings)
+
+
 class NavLinkNode(template.Node):
-    def __init__(self, nav_item, url_node, nodelist):
+    def __init__(self, nav_item, url_node, nodelist, matcher=None):
         self.nav_item = nav_item
         self.url_node = url_node
         self.nodelist = nodelist
+        self.matcher = matcher
+        # Bodies of plain text (the usual case) are joined once, along with the
+        # markup around them.
+        self.content = None
+        if all(isinstance(node, template.base.TextNode) for node in nodelist):
+            self.content = "".join(node.s for node in nodelist)
+            self.active_end = ">{}</a>".format(self.content)
+            self.inactive = {
+                "span": "<span>{}</span>".format(self.content),
+                "link": '">{}</a>'.format(self.content),
+                "none": "",
+            }
+        # Literal URL names without arguments can use the process-wide cache.
+        self.static_url = (
+            not url_node.args
+            and not url_node.kwargs
+            and not url_node.asvar
+            and _is_constant(url_node.view_name)
+        )
 
-    def render(self, context):
-        nav_item = self.nav_item.resolve(context)
+    def render_url(self, context):
+        """
+        Render the URL for this link.
 
-        # Check if alternate nav variable specified with ':'
-        var_name = "nav"
-        if ":" in nav_item:
-            var_name, nav_item = nav_item.split(":", 1)
+        URLs are remembered for the rest of the current render, keyed on the
+        view name, its arguments and the current urlconf and application, so
+        the same URL is only reversed once even when the menu is repeated.
+        """
+        url_node = self.url_node
+        if url_node.asvar:
+            return url_node.render(context)
+        current_app = _current_app(context)
+        urlconf = get_urlconf()
+        if self.static_url and url_cache.maxsize:
+            # The resolver changes after clear_url_caches() or set_urlconf(),
+            # so stale URLs are never found.
+            key = (
+                url_node.view_name.var,
+                get_resolver(urlconf),
+                get_script_prefix(),
+                get_language(),
+                current_app,
+                context.autoescape,
+            )
+            url = url_cache.get(key)
+            if url is None:
+                url = url_node.render(context)
+                url_cache.set(key, url)
+            return url
+        view_name = url_node.view_name.resolve(context)
+        args = tuple(arg.resolve(context) for arg in url_node.args)
+        kwargs = tuple(
+            sorted((k, v.resolve(context)) for k, v in url_node.kwargs.items())
+        )
+        # Values such as 1, 1.0 and True are equal (and hash the same) but
+        # give different URLs.
+        key = (
+            view_name,
+            tuple((type(v), v) for v in args),
+            tuple((k, type(v), v) for k, v in kwargs),
+            urlconf,
+            current_app,
+            context.autoescape,
+        )
+        memo = context.render_context.dicts[0].setdefault(URL_MEMO_KEY, {})
+        try:
+            url = memo.get(key)
+        except TypeError:
+            # Unhashable arguments can't be remembered.
+            return url_node.render(context)
+        if url is None:
+            if args or kwargs:
+                url = self.render_templated_url(
+                    context, view_name, args, dict(kwargs), current_app
+                )
+            if url is None:
+                url = url_node.render(context)
+            memo[key] = url
+        return url
 
-        nav = context.get(var_name)
-        if not isinstance(nav, Nav):
-            nav = Nav()
+    def render_templated_url(self, context, view_name, args, kwargs, current_app):
+        """
+        Render a URL with arguments from a template of the view's route (built
+        the first time the view is reversed with the same argument names).
 
-        # Check if nav item is active
-        try:
-            # For normal patterns, check both exact match and parent match
-            # For special patterns (with !), use the Nav's __eq__ method
-            if "!" in nav_item:
-                # Use Nav's __eq__ for special patterns
-                is_link = nav == nav_item
-            else:
-                # Normal pattern - exact match or parent match
-                active_path = nav.get_active_path() if nav else ""
-                is_exact_match = active_path == nav_item
-                is_parent_match = active_path.startswith(nav_item + ".")
-                is_link = is_exact_match or is_parent_match
-
-            # Get the text value
-            nav_text = ""
-            if is_link and hasattr(nav, "_text_value") and nav._text_value:
-                nav_text = nav._text_value
-                if "=" not in nav_text:
-                    nav_text = ' class="{}"'.format(nav_text.strip())
-        except (KeyError, AttributeError):
-            is_link = False
-            nav_text = ""
+        Returns ``None`` if the URL has to be reversed normally instead.
+        """
+        if not isinstance(view_name, str):
+            return None
+        template_key = (
+            view_name,
+            len(args),
+            tuple(kwargs),
+            get_resolver(get_urlconf()),
+            get_script_prefix(),
+            get_language(),
+            current_app,
+        )
+        url_template = url_templates.get(template_key)
+        if url_template is None:
+            try:
+                url = reverse(
+                    view_name, args=args, kwargs=kwargs, current_app=current_app
+                )
+            except NoReverseMatch:
+                return None
+            url_template = _build_url_template(view_name, url, args, kwargs)
+            url_templates.set(template_key, url_template or NO_TEMPLATE)
+        elif url_template is NO_TEMPLATE:
+            return None
+        else:
+            url = url_template.substitute(args, kwargs)
+            if url is None:
+                return None
+        if context.autoescape:
+            url = conditional_escape(url)
+        return url
+
+    def render(self, context):
+        matcher = self.matcher
+        if matcher is None:
+            nav_item = smart_str(self.nav_item.resolve(context))
+            matcher = compile_pattern(nav_item, navlink=True)
+
+        if _use_static_markup():
+            # The same markup for every nav state, see NavMarkupMiddleware.
+            content = self.content
+            if content is None:
+                content = self.nodelist.render(context)
+            return '<a href="{}" data-nav-path="{}">{}</a>'.format(
+                self.render_url(context), escape(matcher.pattern), content
+            )
+
+        nav = get_nav(context, matcher.var_name)
+        is_link = matcher.matches(() if nav is None else nav._get_path())
+
+        if self.content is not None:
+            if is_link:
+                return (
+                    '<a href="'
+                    + self.render_url(context)
+                    + '"'
+                    + _nav_text(nav)
+                    + self.active_end
+                )
+            inactive = _inactive_mode()
+            if inactive == "link":
+                return '<a href="' + self.render_url(context) + self.inactive["link"]
+            return self.inactive[inactive]
+
+        if not is_link:
+            # Only do the work the inactive output actually needs.
+            inactive = _inactive_mode()
+            if inactive == "none":
+                return ""
+            content = self.nodelist.render(context)
+            if inactive == "link":
+                return '<a href="{}">{}</a>'.format(self.render_url(context), content)
+            return "<span>{}</span>".format(content)
 
         # Get the URL from the url node
-        url = self.url_node.render(context)
+        url = self.render_url(context)
 
         # Get the content inside the block
         content = self.nodelist.render(context)
 
-        # Determine which element to render
-        if is_link:
-            # Truthy but not exact - render as regular link
-            return '<a href="{}"{}>{}</a>'.format(url, nav_text, content)
-        else:
-            # Falsy - render as span
-            return "<span>{}</span>".format(content)
+        return '<a href="{}"{}>{}</a>'.format(url, _nav_text(nav), content)
 
 
 @register.tag
@@ -353,6 +1077,14 @@ def navlink(parser, token):
         {# Active for 'courses.special' but not 'courses.list' #}
 
     Use {% navlink 'alt_nav:products' ... %} to specify a different nav context.
+
+    The ``NAVTAG_INACTIVE`` setting changes how non-matching items render:
+    ``"span"`` (the default), ``"link"`` (a plain link without the nav text) or
+    ``"none"`` (nothing at all). The URL is only reversed when it is output.
+
+    With the ``NAVTAG_STATIC_MARKUP`` setting, every item renders as
+    ``<a href="..." data-nav-path="products">`` whatever the nav state, and the
+    active items are marked afterwards (see ``{% navmarker %}``).
     """
     from django.template.defaulttags import url
 
@@ -367,6 +1099,9 @@ def navlink(parser, token):
 
     # First argument is the nav item
     nav_item = parser.compile_filter(bits[1])
+    matcher = None
+    if _is_constant(nav_item):
+        matcher = compile_pattern(smart_str(nav_item.resolve({})), navlink=True)
 
     # The rest is passed to the url tag
     url_bits = ["url"] + bits[2:]
@@ -380,4 +1115,293 @@ def navlink(parser, token):
     nodelist = parser.parse(("endnavlink",))
     parser.delete_first_token()
 
-    return NavLinkNode(nav_item, url_node, nodelist)
+    return NavLinkNode(nav_item, url_node, nodelist, matcher=matcher)
+
+
+class NavMenuNode(template.Node):
+    def __init__(self, menu_name, var_name="nav", prerender=None, branch=False):
+        self.menu_name = menu_name
+        self.var_name = var_name
+        self.prerender = prerender
+        self.branch = branch
+
+    def render(self, context):
+        from django_navtag.menus import get_menu
+
+        menu = get_menu(smart_str(self.menu_name.resolve(context)))
+        nav = get_nav(context, self.var_name)
+        path = () if nav is None else nav._get_path()
+        request = getattr(context, "request", None)
+        hidden = menu.hidden_items(request)
+        if self.branch:
+            return menu.render_branch(
+                path,
+                nav_text=_nav_text(nav),
+                inactive=_inactive_mode(),
+                current_app=_current_app(context),
+                hidden=hidden,
+                request=request,
+            )
+        return menu.render(
+            path,
+            nav_text=_nav_text(nav),
+            inactive=_inactive_mode(),
+            current_app=_current_app(context),
+            prerender=self.prerender,
+            hidden=hidden,
+            request=request,
+        )
+
+
+@register.tag
+def navmenu(parser, token):
+    """
+    Renders a whole menu from the ``NAVTAG_MENUS`` setting.
+
+    Usage::
+
+        {% nav text 'active' %}
+        {% navmenu "main" %}
+
+    Each menu is a list of ``(nav path, url name, label)`` items, with an
+    optional fourth element holding a list of child items::
+
+        NAVTAG_MENUS = {
+            "main": [
+                ("home", "home", "Home"),
+                ("products", "products:list", "Products", [
+                    ("products.phones", "products:phones", "Phones"),
+                ]),
+            ],
+        }
+
+    Items render just like ``{% navlink %}`` tags, inside nested ``<ul>``
+    lists. Use ``{% navmenu "main" for sidenav %}`` to check against an
+    alternate nav context variable.
+
+    Add ``prerender`` (``{% navmenu "main" prerender %}``) to render every
+    active state of the menu the first time it's used, so that later renders
+    only need to look up the right variant.
+
+    Add ``branch`` (``{% navmenu "main" branch %}``) to only render the root
+    items and the children of active items. Collapsed subtrees can be fetched
+    from the ``django_navtag.views.menu_subtree`` view.
+    """
+    bits = token.split_contents()
+    prerender = None
+    branch = False
+    if bits[-1] == "prerender":
+        prerender = True
+        bits.pop()
+    elif bits[-1] == "branch":
+        branch = True
+        bits.pop()
+    if len(bits) == 4 and bits[2] == "for":
+        var_name = bits[3]
+    elif len(bits) == 2:
+        var_name = "nav"
+    else:
+        raise template.TemplateSyntaxError(
+            "Unexpected format for {} tag".format(bits[0])
+        )
+    return NavMenuNode(parser.compile_filter(bits[1]), var_name, prerender, branch)
+
+
+class NavCacheNode(template.Node):
+    def __init__(self, nodelist, timeout, fragment_name, var_name="nav"):
+        self.nodelist = nodelist
+        self.timeout = timeout
+        self.fragment_name = fragment_name
+        self.var_name = var_name
+
+    def cache_key(self, context):
+        """
+        Build the cache key from the fragment name and everything that changes
+        how nav markup renders.
+        """
+        nav = get_nav(context, self.var_name)
+        if nav is not None:
+            active_path = nav.get_active_path()
+            text = smart_str(nav._state.text) if nav._state.has_text else ""
+        else:
+            active_path = text = ""
+        parts = [
+            smart_str(self.fragment_name.resolve(context)),
+            active_path,
+            text,
+            smart_str(get_urlconf() or settings.ROOT_URLCONF),
+            get_script_prefix(),
+            get_language() or "",
+            smart_str(_current_app(context) or ""),
+        ]
+        digest = hashlib.md5("\n".join(parts).encode(), usedforsecurity=False)
+        return "navtag.cache.{}".format(digest.hexdigest())
+
+    def render(self, context):
+        timeout = self.timeout.resolve(context)
+        if timeout is not None:
+            try:
+                timeout = int(timeout)
+            except (ValueError, TypeError):
+                raise template.TemplateSyntaxError(
+                    "navcache timeout must be a number, not {!r}".format(timeout)
+                )
+            if timeout <= 0:
+                return self.nodelist.render(context)
+        key = self.cache_key(context)
+        now = time.time()
+        cached = fragment_cache.get(key)
+        if cached is not None and cached[0] > now:
+            return cached[1]
+        cache = caches[getattr(settings, "NAVTAG_CACHE", "default")]
+        # Shared entries hold their expiry time, so the local copy of a
+        # fragment never outlives the shared one.
+        cached = cache.get(key)
+        if cached is None or (cached[0] is not None and cached[0] <= now):
+            content = self.nodelist.render(context)
+            expires = None if timeout is None else now + timeout
+            cache.set(key, (expires, content), timeout)
+        else:
+            expires, content = cached
+        # Changes to the shared cache (such as clearing it) only reach other
+        # processes when their local copies expire.
+        local_expires = now + getattr(settings, "NAVTAG_LOCAL_CACHE_TIMEOUT", 60)
+        if expires is None or expires > local_expires:
+            expires = local_expires
+        fragment_cache.set(key, (expires, content))
+        return content
+
+
+@register.tag
+def navcache(parser, token):
+    """
+    Caches a block of nav markup for each distinct nav state.
+
+    Usage::
+
+        {% navcache 600 "main-menu" %}
+            {% navlink 'home' 'home' %}Home{% endnavlink %}
+            ...
+        {% endnavcache %}
+
+    Works like Django's ``{% cache %}`` tag, except the cache key always
+    varies on the nav's active path and text, the current urlconf, script
+    prefix, language and application. Use ``{% navcache 600 "menu" for
+    sidenav %}`` to vary on an alternate nav context variable. A timeout of
+    ``None`` caches forever.
+
+    Fragments are stored in the ``NAVTAG_CACHE`` cache (``"default"`` unless
+    set), with an in-process LRU of up to ``NAVTAG_LOCAL_CACHE_SIZE`` (256)
+    fragments in front of it. Each process keeps its copies until the shared
+    entry expires, or for at most ``NAVTAG_LOCAL_CACHE_TIMEOUT`` (60) seconds.
+    """
+    bits = token.split_contents()
+    var_name = "nav"
+    if len(bits) == 5 and bits[3] == "for":
+        var_name = bits.pop()
+        bits.pop()
+    if len(bits) != 3:
+        raise template.TemplateSyntaxError(
+            "Unexpected format for {} tag".format(bits[0])
+        )
+    nodelist = parser.parse(("endnavcache",))
+    parser.delete_first_token()
+    return NavCacheNode(
+        nodelist,
+        parser.compile_filter(bits[1]),
+        parser.compile_filter(bits[2]),
+        var_name,
+    )
+
+
+class NavMarkerNode(template.Node):
+    def __init__(self, var_name="nav", script=False):
+        self.var_name = var_name
+        self.script = script
+
+    def render(self, context):
+        nav = get_nav(context, self.var_name)
+        state = {"var": self.var_name, "path": "", "text": ""}
+        if nav is not None:
+            state["path"] = nav.get_active_path()
+            state["text"] = smart_str(nav._state.text or "")
+        data = json.dumps(state)
+        if self.script:
+            return mark_safe(
+                "<script>{}({})</script>".format(
+                    NAV_MARKER_SCRIPT, data.replace("<", "\\u003c")
+                )
+            )
+        # Comments can't contain "--", which JSON can escape instead.
+        return mark_safe("<!--navtag:{}-->".format(data.replace("-", "\\u002d")))
+
+
+NAV_MARKER_SCRIPT = """(function (s) {
+  var m, a = s.path ? s.path.split(".") : [], t = s.text;
+  if (t && t.indexOf("=") < 0) t = ' class="' + t.trim() + '"';
+  var r = /([\\w:-]+)="([^"]*)"/g, attrs = [];
+  while (t && (m = r.exec(t))) attrs.push([m[1], m[2]]);
+  function split(p) { return p ? p.split(".") : []; }
+  function starts(p) {
+    for (var i = 0; i < p.length; i++) if (a[i] !== p[i]) return false;
+    return a.length >= p.length;
+  }
+  function glob(p, i, j) {
+    if (i === p.length) return j === a.length;
+    if (p[i] === "**") {
+      for (var k = j; k <= a.length; k++) if (glob(p, i + 1, k)) return true;
+      return false;
+    }
+    var c = p[i], alt = c.charAt(0) === "(" && c.slice(-1) === ")";
+    if (j === a.length) return false;
+    if (alt ? c.slice(1, -1).split("|").indexOf(a[j]) < 0 :
+        c !== "*" && c !== a[j]) return false;
+    return glob(p, i + 1, j + 1);
+  }
+  document.querySelectorAll("[data-nav-path]").forEach(function (el) {
+    var p = el.getAttribute("data-nav-path"), v = "nav", i = p.indexOf(":");
+    if (i >= 0) { v = p.slice(0, i); p = p.slice(i + 1); }
+    if (v !== s["var"]) return;
+    var parts = p.split("!"), parent = split(parts[0]), ok;
+    if (parts.length > 1) {
+      var ex = split(parts.slice(1).join("!"));
+      ok = starts(parent) && a.length > parent.length &&
+        !(ex.length && starts(parent.concat(ex)));
+    } else if (/[*(]/.test(p)) {
+      if (parent[parent.length - 1] !== "**") parent.push("**");
+      ok = glob(parent, 0, 0);
+    } else {
+      ok = parent.length ? starts(parent) : !a.length;
+    }
+    if (ok) attrs.forEach(function (x) { el.setAttribute(x[0], x[1]); });
+  });
+})"""
+
+
+@register.tag
+def navmarker(parser, token):
+    """
+    Outputs the nav state for links rendered with ``NAVTAG_STATIC_MARKUP``.
+
+    Usage::
+
+        {% navmarker %} or {% navmarker for sidenav %}
+
+    This renders a small HTML comment which ``NavMarkupMiddleware`` removes,
+    marking the matching ``data-nav-path`` links as active. Alternately, use
+    ``{% navmarker script %}`` (at the end of the page) to mark them in the
+    browser instead.
+    """
+    bits = token.split_contents()
+    script = bits[-1] == "script"
+    if script:
+        bits.pop()
+    if len(bits) == 3 and bits[1] == "for":
+        var_name = bits[2]
+    elif len(bits) == 1:
+        var_name = "nav"
+    else:
+        raise template.TemplateSyntaxError(
+            "Unexpected format for {} tag".format(bits[0])
+        )
+    return NavMarkerNode(var_name, script)
@@ -0,0 +1,5 @@
+from django.urls import include, path
+
+urlpatterns = [
+    path("alt/", include("django_navtag.tests.urls")),
+]
@@ -7,10 +7,13 @@ DATABASES = {
 
 INSTALLED_APPS = [
     "django_navtag",
+    "django_navtag.db",
 ]
 
 SECRET_KEY = "testing"
 
+ROOT_URLCONF = "django_navtag.tests.urls"
+
 MIDDLEWARE_CLASSES = (
     "django.middleware.common.CommonMiddleware",
     "django.middleware.csrf.CsrfViewMiddleware",
@@ -0,0 +1,152 @@
+import asyncio
+import contextvars
+from concurrent.futures import ThreadPoolExecutor
+from unittest import mock
+
+from django import template
+from django.core.signals import request_started
+from django.template import engines
+from django.test import RequestFactory, TestCase, override_settings
+
+import django_navtag
+from django_navtag.templatetags.navtag import Nav, get_nav
+from django_navtag.tests.test_views import TEMPLATES
+
+LINKS = (
+    "{% load navtag %}"
+    "{% navlink 'home' 'home' %}Home{% endnavlink %}"
+    "{% navlink 'about' 'about' %}About{% endnavlink %}"
+)
+
+
+class ActiveTest(TestCase):
+    def setUp(self):
+        self.token = django_navtag.set_active(None)
+
+    def tearDown(self):
+        django_navtag.reset_active(self.token)
+
+    def render(self, source=LINKS):
+        return template.Template(source).render(template.Context())
+
+    def test_set_and_reset(self):
+        self.assertIsNone(django_navtag.get_active())
+        token = django_navtag.set_active("products.phones")
+        self.assertEqual(django_navtag.get_active(), "products.phones")
+        django_navtag.reset_active(token)
+        self.assertIsNone(django_navtag.get_active())
+
+    def test_navlink(self):
+        self.assertEqual(self.render(), "<span>Home</span><span>About</span>")
+        django_navtag.set_active("about")
+        self.assertEqual(self.render(), '<span>Home</span><a href="/about/">About</a>')
+        nav = get_nav(template.Context())
+        self.assertEqual(nav.get_active_path(), "about")
+        self.assertIsNone(get_nav(template.Context(), "sidenav"))
+
+    def test_nav_tag(self):
+        """The active item is kept by {% nav %}, which can still set the text"""
+        django_navtag.set_active("about")
+        content = self.render(
+            "{% load navtag %}{% nav 'home' %}{% nav text 'active' %}"
+            "{% if nav.about %}About {% endif %}" + LINKS
+        )
+        self.assertEqual(
+            content, 'About <span>Home</span><a href="/about/" class="active">About</a>'
+        )
+        # The shared nav wasn't given the text.
+        self.assertEqual(self.render(), '<span>Home</span><a href="/about/">About</a>')
+
+    @override_settings(TEMPLATES=TEMPLATES)
+    def test_context_processor(self):
+        """The context processor's nav is activated, unless it has an item"""
+        django_navtag.set_active("about")
+        source = "{% load navtag %}{% nav text 'active' %}{% nav 'home' %}" + LINKS
+        t = engines["django"].from_string(source)
+        request = RequestFactory().get("/")
+        self.assertEqual(
+            t.render({}, request),
+            '<span>Home</span><a href="/about/" class="active">About</a>',
+        )
+        request.nav_item = "home"
+        self.assertEqual(
+            t.render({}, request),
+            '<a href="/" class="active">Home</a><span>About</span>',
+        )
+
+    @override_settings(TEMPLATES=TEMPLATES)
+    def test_single_lookup(self):
+        """The context stack is only searched once per render"""
+        django_navtag.set_active("about")
+        source = (
+            "{% for i in '123' %}{% with a=i %}" + LINKS + "{% endwith %}{% endfor %}"
+        )
+        get = template.Context.get
+        for render in (
+            lambda: self.render(source),
+            lambda: (
+                engines["django"]
+                .from_string(source)
+                .render({}, RequestFactory().get("/"))
+            ),
+        ):
+            with mock.patch.object(
+                template.Context, "get", autospec=True, side_effect=get
+            ) as patched:
+                content = render()
+            self.assertEqual(
+                content, '<span>Home</span><a href="/about/">About</a>' * 3
+            )
+            lookups = [call for call in patched.call_args_list if call[0][1] == "nav"]
+            self.assertEqual(len(lookups), 1)
+
+    def test_context_nav(self):
+        """A nav passed to the template is used over the active item"""
+        django_navtag.set_active("about")
+        nav = Nav()
+        nav._activate(("home",))
+        t = template.Template("{% if nav.home %}Home {% endif %}" + LINKS)
+        content = t.render(template.Context({"nav": nav}))
+        self.assertEqual(content, 'Home <a href="/">Home</a><span>About</span>')
+
+    def test_other_variables(self):
+        django_navtag.set_active("about")
+        content = self.render(
+            "{% load navtag %}{% nav 'home' for sidenav %}"
+            "{% navlink 'sidenav:home' 'home' %}Home{% endnavlink %}"
+        )
+        self.assertEqual(content, '<a href="/">Home</a>')
+
+    def test_asyncio_tasks(self):
+        async def render(item):
+            django_navtag.set_active(item)
+            await asyncio.sleep(0)
+            return self.render()
+
+        async def main():
+            return await asyncio.gather(render("home"), render("about"))
+
+        home, about = asyncio.run(main())
+        self.assertEqual(home, '<a href="/">Home</a><span>About</span>')
+        self.assertEqual(about, '<span>Home</span><a href="/about/">About</a>')
+        self.assertIsNone(django_navtag.get_active())
+
+    def test_threads(self):
+        def render(item):
+            django_navtag.set_active(item)
+            return django_navtag.get_active()
+
+        items = ["home", "about"] * 10
+        with ThreadPoolExecutor(4) as pool:
+            results = list(
+                pool.map(
+                    lambda item: contextvars.copy_context().run(render, item), items
+                )
+            )
+        self.assertEqual(results, items)
+        self.assertIsNone(django_navtag.get_active())
+
+    def test_reset_per_request(self):
+        django_navtag.set_active("about")
+        request_started.send(sender=None)
+        self.assertIsNone(django_navtag.get_active())
@@ -0,0 +1,636 @@
+from unittest import mock
+
+from django import template
+from django.core.cache import caches
+from django.core.exceptions import ImproperlyConfigured
+from django.test import RequestFactory, TestCase, modify_settings, override_settings
+
+from django_navtag import menus
+
+MENUS = {
+    "main": [
+        ("home", "home", "Home"),
+        (
+            "products",
+            "products",
+            "Products & Services",
+            [
+                ("products.phones", "/phones/", "Phones"),
+                ("products.tablets", "/tablets/", "Tablets"),
+            ],
+        ),
+        ("about", "about", "About"),
+    ],
+}
+
+
+@override_settings(NAVTAG_MENUS=MENUS)
+class MenuTest(TestCase):
+    def render(self, source, **context):
+        t = template.Template("{% load navtag %}" + source)
+        return t.render(template.Context(context))
+
+    def test_menu_from_settings(self):
+        menu = menus.get_menu("main")
+        self.assertIs(menus.get_menu("main"), menu)
+        self.assertEqual(
+            [item.dotted_path for item in menu.items],
+            ["home", "products", "products.phones", "products.tablets", "about"],
+        )
+        self.assertEqual([item.depth for item in menu.items], [0, 0, 1, 1, 0])
+        self.assertIs(menu.items[2].parent, menu.items[1])
+
+    def test_unknown_menu(self):
+        self.assertRaises(ImproperlyConfigured, menus.get_menu, "footer")
+
+    def test_bad_item(self):
+        self.assertRaises(ImproperlyConfigured, menus.Menu, "bad", [("home",)])
+        self.assertRaises(ImproperlyConfigured, menus.Menu, "bad", [("", "home", "")])
+
+    def test_active_items(self):
+        menu = menus.get_menu("main")
+        self.assertEqual(menu.active_items(("products", "phones", "x")), {1, 2})
+        self.assertEqual(menu.active_items(("products",)), {1})
+        self.assertEqual(menu.active_items(("contact",)), set())
+        self.assertEqual(menu.active_items(()), set())
+
+    def test_render(self):
+        menu = menus.Menu("test", [("phones", "/phones/", "Phones")])
+        self.assertEqual(menu.render(()), "<ul><li><span>Phones</span></li></ul>")
+
+    def test_navmenu(self):
+        with self.settings(NAVTAG_MENUS={"main": [("home", "home", "Home")]}):
+            content = self.render("{% nav 'home' %}{% navmenu 'main' %}")
+        self.assertEqual(content, '<ul><li><a href="/">Home</a></li></ul>')
+
+        content = self.render(
+            "{% nav text 'active' %}{% nav 'products.tablets' %}{% navmenu 'main' %}"
+        )
+        self.assertEqual(
+            content,
+            "<ul>"
+            "<li><span>Home</span></li>"
+            '<li><a href="/products/" class="active">Products &amp; Services</a>'
+            "<ul>"
+            "<li><span>Phones</span></li>"
+            '<li><a href="/tablets/" class="active">Tablets</a></li>'
+            "</ul></li>"
+            "<li><span>About</span></li>"
+            "</ul>",
+        )
+
+    def test_navmenu_for(self):
+        content = self.render(
+            "{% nav 'about' for sidenav %}{% nav 'home' %}"
+            "{% navmenu name for sidenav %}",
+            name="main",
+        )
+        self.assertIn('<a href="/about/">About</a>', content)
+        self.assertIn("<span>Home</span>", content)
+
+    def test_navmenu_inactive_none(self):
+        with self.settings(NAVTAG_INACTIVE="none"):
+            content = self.render("{% nav 'about' %}{% navmenu 'main' %}")
+        self.assertEqual(content, '<ul><li><a href="/about/">About</a></li></ul>')
+
+    def test_navmenu_invalid(self):
+        self.assertRaises(
+            template.TemplateSyntaxError,
+            template.Template,
+            "{% load navtag %}{% navmenu 'main' 'other' %}",
+        )
+
+    def test_branch(self):
+        content = self.render("{% nav text 'active' %}{% navmenu 'main' branch %}")
+        self.assertEqual(
+            content,
+            "<ul>"
+            "<li><span>Home</span></li>"
+            '<li data-nav-subtree="products"><span>Products &amp; Services</span></li>'
+            "<li><span>About</span></li>"
+            "</ul>",
+        )
+        # The active branch renders the same as the whole menu.
+        source = "{% nav text 'active' %}{% nav 'products.phones' %}{% navmenu 'main'"
+        self.assertEqual(
+            self.render(source + " branch %}"), self.render(source + " %}")
+        )
+
+    def test_branch_only_renders_active_branch(self):
+        children = [("products.x%d" % i, "/x/", "X") for i in range(5)]
+        menu = menus.Menu(
+            "deep",
+            [
+                ("home", "/", "Home", [("home.a", "/a/", "A", children)]),
+                ("products", "/p/", "Products", children),
+            ],
+        )
+        with mock.patch(
+            "django_navtag.menus._fragments", wraps=menus._fragments
+        ) as fragments:
+            content = menu.render_branch(("products", "x1"))
+        # The two roots and the active item's five children.
+        self.assertEqual(fragments.call_count, 7)
+        self.assertIn('<li data-nav-subtree="home"><span>Home</span></li>', content)
+        self.assertNotIn("home.a", content)
+
+    def test_subtree(self):
+        menu = menus.get_menu("main")
+        item = menu.find(("products",))
+        self.assertIs(item, menu.items[1])
+        self.assertIsNone(menu.find(("products", "other")))
+        content = menu.render_subtree(item)
+        self.assertEqual(
+            content,
+            "<ul><li><span>Phones</span></li><li><span>Tablets</span></li></ul>",
+        )
+        with mock.patch("django_navtag.menus._fragments") as fragments:
+            self.assertEqual(menu.render_subtree(item), content)
+        fragments.assert_not_called()
+
+    def test_subtree_view(self):
+        response = self.client.get("/navtag/subtree/main/products/")
+        self.assertEqual(
+            response.content.decode(),
+            "<ul><li><span>Phones</span></li><li><span>Tablets</span></li></ul>",
+        )
+        self.assertEqual(self.client.get("/navtag/subtree/main/home/").status_code, 404)
+        self.assertEqual(self.client.get("/navtag/subtree/main/x/").status_code, 404)
+        self.assertEqual(
+            self.client.get("/navtag/subtree/other/home/").status_code, 404
+        )
+
+    def test_register(self):
+        menu = menus.register("extra", [("home", "home", "Home")])
+        self.assertIs(menus.get_menu("extra"), menu)
+        self.assertEqual(
+            self.render("{% navmenu 'extra' %}"),
+            "<ul><li><span>Home</span></li></ul>",
+        )
+
+    def test_renderer_matches_navlinks(self):
+        """Compiled menus output exactly what the equivalent navlinks would"""
+        navlinks = (
+            "{% navlink 'home' 'home' %}Home{% endnavlink %}"
+            "{% navlink 'products' 'products' %}Products &amp; Services"
+            "{% endnavlink %}"
+        )
+        for inactive in ("span", "link", "none"):
+            for text in ("active", ' aria-current="page"'):
+                source = "{{% nav text '{}' %}}{{% nav 'products.phones' %}}".format(
+                    text
+                )
+                with self.settings(NAVTAG_INACTIVE=inactive):
+                    expected = self.render(source + navlinks)
+                    content = self.render(source + "{% navmenu 'main' %}")
+                content = content.replace("<ul>", "").replace("</ul>", "")
+                content = content.replace("<li>", "").replace("</li>", "")
+                self.assertTrue(content.startswith(expected), (content, expected))
+
+    def test_renderer_cached(self):
+        menu = menus.get_menu("main")
+        renderer = menu.get_renderer()
+        self.assertIs(menu.get_renderer(), renderer)
+        self.assertIsNot(menu.get_renderer("link"), renderer)
+        self.assertIn("if 1 in active", renderer.source)
+        self.assertIn("<span>Home</span>", renderer.source)
+
+        with self.settings(NAVTAG_MENUS={"main": MENUS["main"][:1]}):
+            self.assertIsNot(menus.get_menu("main").get_renderer(), renderer)
+        self.assertIs(menus.get_menu("main").get_renderer(), renderer)
+
+    def test_renderer_source(self):
+        from django_navtag.codegen import menu_source
+
+        menu = menus.Menu("test", [("a", "/a/", "A", [("a.b", "/b/", "B")])])
+        source = menu_source(menu.roots, ["/a/", "/b/"], inactive="none")
+        self.assertEqual(
+            source,
+            "def render(active, nav_text):\n"
+            "    parts = []\n"
+            "    append = parts.append\n"
+            "    append('<ul>')\n"
+            "    if 0 in active:\n"
+            "        append('<li><a href=\"/a/\"')\n"
+            "        append(nav_text)\n"
+            "        append('>A</a><ul>')\n"
+            "        if 1 in active:\n"
+            "            append('<li><a href=\"/b/\"')\n"
+            "            append(nav_text)\n"
+            "            append('>B</a></li>')\n"
+            "        append('</ul></li>')\n"
+            "    append('</ul>')\n"
+            '    return "".join(parts)\n',
+        )
+
+    def test_active_variants(self):
+        menu = menus.get_menu("main")
+        self.assertEqual(
+            list(menu.active_variants()),
+            [
+                frozenset(),
+                frozenset([0]),
+                frozenset([1]),
+                frozenset([1, 2]),
+                frozenset([1, 3]),
+                frozenset([4]),
+            ],
+        )
+
+    def test_prerender(self):
+        menus.variants.clear()
+        menu = menus.register("prerendered", MENUS["main"], prerender=True)
+        expected = menu.render(("products", "phones"), prerender=False)
+        self.assertEqual(len(menus.variants), 0)
+
+        with mock.patch.object(
+            menus.Menu, "active_variants", wraps=menu.active_variants
+        ) as active_variants:
+            self.assertEqual(menu.render(("products", "phones", "x")), expected)
+            self.assertEqual(len(menus.variants), 6)
+            self.assertEqual(menu.render(("products", "phones")), expected)
+            self.assertEqual(len(menus.variants), 6)
+        active_variants.assert_called_once_with()
+
+        # Each nav text has its own variants.
+        menu.render((), nav_text=' class="on"')
+        self.assertEqual(len(menus.variants), 12)
+
+    def test_prerender_bounded(self):
+        menu = menus.get_menu("main")
+        with self.settings(NAVTAG_MENU_VARIANTS=2):
+            content = self.render("{% nav 'about' %}{% navmenu 'main' prerender %}")
+            self.assertEqual(content, menu.render(("about",)))
+            self.assertEqual(len(menus.variants), 2)
+
+            # Only as many variants as fit are rendered up front.
+            bounded = menus.register("bounded", MENUS["main"], prerender=True)
+            rendered = []
+            all_variants = bounded.active_variants
+
+            def active_variants():
+                for variant in all_variants():
+                    rendered.append(variant)
+                    yield variant
+
+            bounded.active_variants = active_variants
+            bounded.render(("about",))
+            self.assertEqual(len(rendered), 2)
+        with self.settings(NAVTAG_MENU_VARIANTS=0):
+            content = self.render("{% nav 'home' %}{% navmenu 'main' prerender %}")
+            self.assertEqual(content, menu.render(("home",)))
+            self.assertEqual(len(menus.variants), 0)
+
+    def test_prerender_definition_changed(self):
+        menu = menus.register("changing", MENUS["main"], prerender=True)
+        before = menu.render(("home",))
+        menu = menus.register("changing", MENUS["main"][:1], prerender=True)
+        self.assertNotEqual(menu.render(("home",)), before)
+
+
+class User:
+    is_active = True
+    is_superuser = False
+
+    def __init__(self, *permissions):
+        self.permissions = set(permissions)
+        self.fetched = 0
+
+    def get_all_permissions(self):
+        self.fetched += 1
+        return self.permissions
+
+
+def is_staff(request):
+    return request.GET.get("staff") == "1"
+
+
+RESTRICTED = [
+    ("home", "home", "Home"),
+    {
+        "path": "products",
+        "url_name": "products",
+        "label": "Products",
+        "permissions": "shop.view_product",
+        "children": [
+            ("products.phones", "/phones/", "Phones"),
+            ("products.secret", "missing-url", "Secret", [], ["shop.view_secret"]),
+        ],
+    },
+    ("admin", "admin-url-missing", "Admin", [], [], is_staff),
+    (
+        "about",
+        "about",
+        "About",
+        [],
+        [],
+        "django_navtag.tests.test_menus.is_staff",
+    ),
+]
+
+
+@override_settings(
+    TEMPLATES=[{"BACKEND": "django.template.backends.django.DjangoTemplates"}]
+)
+class VisibilityTest(TestCase):
+    def setUp(self):
+        self.menu = menus.register("restricted", RESTRICTED)
+
+    def request(self, user=None, **params):
+        request = RequestFactory().get("/", params)
+        if user is not None:
+            request.user = user
+        return request
+
+    def render(self, request, source="{% navmenu 'restricted' %}"):
+        t = template.Template("{% load navtag %}{% nav 'products.phones' %}" + source)
+        return t.render(template.RequestContext(request))
+
+    def test_hidden_items(self):
+        self.assertEqual(self.menu.hidden_items(self.request()), {1, 2, 3, 4, 5})
+        user = User("shop.view_product")
+        self.assertEqual(self.menu.hidden_items(self.request(user)), {3, 4, 5})
+        user = User("shop.view_product", "shop.view_secret")
+        self.assertEqual(self.menu.hidden_items(self.request(user, staff="1")), set())
+        superuser = User()
+        superuser.is_superuser = True
+        self.assertEqual(self.menu.hidden_items(self.request(superuser)), {4, 5})
+        self.assertEqual(self.menu.hidden_items(None), {1, 2, 3, 4, 5})
+
+    def test_unrestricted(self):
+        menu = menus.Menu("open", [("home", "home", "Home")])
+        self.assertFalse(menu.restricted)
+        self.assertEqual(menu.hidden_items(None), set())
+
+    def test_batched_per_request(self):
+        user = User("shop.view_product")
+        request = self.request(user)
+        predicate = mock.Mock(return_value=True)
+        menus.register(
+            "restricted",
+            [("home", "home", "Home", [], [], predicate)] + RESTRICTED[1:2],
+        )
+        hidden = menus.get_menu("restricted").hidden_items(request)
+        self.assertEqual(hidden, {3})
+        self.render(request)
+        self.render(request, "{% navmenu 'restricted' branch %}")
+        self.assertEqual(predicate.call_count, 1)
+        self.assertEqual(user.fetched, 1)
+
+    def test_render(self):
+        request = self.request(User("shop.view_product"))
+        self.assertEqual(
+            self.render(request),
+            "<ul><li><span>Home</span></li>"
+            '<li><a href="/products/">Products</a>'
+            '<ul><li><a href="/phones/">Phones</a></li></ul></li></ul>',
+        )
+        # Hidden items are never reversed (these URL names don't exist).
+        self.assertNotIn(
+            "Secret", self.render(request, "{% navmenu 'restricted' branch %}")
+        )
+        self.assertEqual(
+            self.render(self.request()), "<ul><li><span>Home</span></li></ul>"
+        )
+
+    def test_render_cached_per_hidden_set(self):
+        user = User("shop.view_product", "shop.view_secret")
+        with mock.patch("django_navtag.menus.reverse", return_value="/x/"):
+            staff = self.render(self.request(user, staff="1"))
+        self.assertIn("Admin", staff)
+        self.assertNotIn("Admin", self.render(self.request(User("shop.view_product"))))
+
+    def test_invalid(self):
+        self.assertRaises(
+            ImproperlyConfigured, menus.Menu, "bad", [{"path": "home", "url": "home"}]
+        )
+
+
+class DatabaseMenuTest(TestCase):
+    def setUp(self):
+        from django_navtag.db.models import Menu, MenuItem
+
+        caches["default"].clear()
+        self.menu = Menu.objects.create(name="db")
+        for order, (path, url, label) in enumerate(
+            [
+                ("products.tablets", "/tablets/", "Tablets"),
+                ("home", "home", "Home"),
+                ("products", "products", "Products"),
+                ("products.phones", "/phones/", "Phones"),
+                ("about.team.people", "/people/", "People"),
+            ]
+        ):
+            MenuItem.objects.create(
+                menu=self.menu, path=path, url=url, label=label, order=order
+            )
+
+    def test_load(self):
+        from django_navtag.db.models import load_menu_data
+
+        with self.assertNumQueries(1):
+            tree = load_menu_data("db")
+        self.assertEqual(
+            [tree.path(i) for i in range(len(tree))],
+            [
+                "home",
+                "products",
+                "products.tablets",
+                "products.phones",
+                "about.team.people",
+            ],
+        )
+        self.assertEqual(list(tree.parents), [-1, -1, 1, 1, -1])
+        self.assertEqual(tree.labels[2], "Tablets")
+        self.assertIsNone(load_menu_data("missing"))
+
+    def test_render(self):
+        t = template.Template(
+            "{% load navtag %}{% nav 'products.phones' %}{% navmenu 'db' %}"
+        )
+        with self.assertNumQueries(1):
+            content = t.render(template.Context())
+        self.assertIn('<li><a href="/phones/">Phones</a></li>', content)
+        with self.assertNumQueries(0):
+            self.assertEqual(t.render(template.Context()), content)
+
+    def test_cached(self):
+        from django_navtag.db import models
+
+        menu = menus.get_menu("db")
+        with self.assertNumQueries(0):
+            self.assertIs(menus.get_menu("db"), menu)
+        # Another process only has the shared cache.
+        models._loaded.clear()
+        with self.assertNumQueries(0):
+            self.assertEqual(len(menus.get_menu("db").items), 5)
+
+    def test_invalidate(self):
+        menu = menus.get_menu("db")
+        item = self.menu.items.get(path="home")
+        item.label = "Start"
+        item.save()
+        changed = menus.get_menu("db")
+        self.assertIsNot(changed, menu)
+        self.assertEqual(changed.items[0].label, "Start")
+        item.delete()
+        self.assertEqual(len(menus.get_menu("db").items), 4)
+        self.menu.delete()
+        self.assertRaises(ImproperlyConfigured, menus.get_menu, "db")
+
+    @override_settings(
+        CACHES={
+            "default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"},
+            "dummy": {"BACKEND": "django.core.cache.backends.dummy.DummyCache"},
+        },
+        NAVTAG_CACHE="dummy",
+    )
+    def test_dummy_cache(self):
+        """Edits are still picked up with a cache that never stores anything"""
+        from django_navtag.db.models import MenuItem
+
+        self.assertEqual(len(menus.get_menu("db").items), 5)
+        MenuItem.objects.create(menu=self.menu, path="contact", url="/c/", label="C")
+        self.assertEqual(len(menus.get_menu("db").items), 6)
+
+    @modify_settings(INSTALLED_APPS={"remove": ["django_navtag.db"]})
+    def test_disabled(self):
+        self.assertRaises(ImproperlyConfigured, menus.get_menu, "db")
+
+
+class Badges:
+    def __init__(self, **values):
+        self.values = values
+        self.calls = []
+
+    def __call__(self, request, paths):
+        self.calls.append(paths)
+        return {path: self.values.get(path.replace(".", "_")) for path in paths}
+
+
+@override_settings(
+    TEMPLATES=[{"BACKEND": "django.template.backends.django.DjangoTemplates"}]
+)
+class BadgeTest(TestCase):
+    def setUp(self):
+        caches["default"].clear()
+        self.counts = Badges(home=3, products_phones="<9>")
+        self.other = Badges(about=1)
+        menus.register(
+            "badged",
+            [
+                ("home", "home", "Home", [], [], None, self.counts),
+                (
+                    "products",
+                    "products",
+                    "Products",
+                    [
+                        (
+                            "products.phones",
+                            "/phones/",
+                            "Phones",
+                            [],
+                            [],
+                            None,
+                            self.counts,
+                        ),
+                        (
+                            "products.tablets",
+                            "/tablets/",
+                            "Tablets",
+                            [],
+                            [],
+                            None,
+                            self.counts,
+                        ),
+                    ],
+                ),
+                {
+                    "path": "about",
+                    "url_name": "about",
+                    "label": "About",
+                    "badge": self.other,
+                },
+            ],
+        )
+        self.request = RequestFactory().get("/")
+
+    def render(self, source="{% navmenu 'badged' %}", item="products.phones"):
+        t = template.Template("{% load navtag %}{% nav item %}" + source)
+        return t.render(template.RequestContext(self.request, {"item": item}))
+
+    def test_render(self):
+        content = self.render()
+        self.assertEqual(
+            content,
+            '<ul><li><span>Home</span><span class="badge">3</span></li>'
+            '<li><a href="/products/">Products</a><ul>'
+            '<li><a href="/phones/">Phones</a><span class="badge">&lt;9&gt;</span></li>'
+            "<li><span>Tablets</span></li></ul></li>"
+            '<li><span>About</span><span class="badge">1</span></li></ul>',
+        )
+        # One call per provider, with every rendered item.
+        self.assertEqual(
+            self.counts.calls, [["home", "products.phones", "products.tablets"]]
+        )
+        self.assertEqual(self.other.calls, [["about"]])
+
+    def test_per_request(self):
+        first = self.render()
+        self.assertEqual(self.render(), first)
+        self.assertEqual(len(self.counts.calls), 1)
+        self.request = RequestFactory().get("/")
+        self.render()
+        self.assertEqual(len(self.counts.calls), 2)
+
+    def test_only_rendered_items(self):
+        with self.settings(NAVTAG_INACTIVE="none"):
+            self.render()
+        self.assertEqual(self.counts.calls, [["products.phones"]])
+        self.assertEqual(self.other.calls, [])
+
+    def test_branch(self):
+        content = self.render("{% navmenu 'badged' branch %}", item="about")
+        self.assertIn('About</a><span class="badge">1</span>', content)
+        self.assertEqual(self.counts.calls, [["home"]])
+        content = menus.get_menu("badged").render_subtree(
+            menus.get_menu("badged").items[1], request=self.request
+        )
+        self.assertIn(
+            '<span>Phones</span><span class="badge">&lt;9&gt;</span>', content
+        )
+        self.assertEqual(self.counts.calls[1], ["products.phones", "products.tablets"])
+
+    def test_badge_added(self):
+        """Adding a badge to a menu compiles a new renderer"""
+        menus.register("rebadged", [("home", "home", "Home")])
+        source = "{% navmenu 'rebadged' %}"
+        self.assertEqual(self.render(source), "<ul><li><span>Home</span></li></ul>")
+        menus.register(
+            "rebadged", [("home", "home", "Home", [], [], None, self.counts)]
+        )
+        self.assertEqual(
+            self.render(source),
+            '<ul><li><span>Home</span><span class="badge">3</span></li></ul>',
+        )
+
+    def test_no_request(self):
+        t = template.Template("{% load navtag %}{% navmenu 'badged' %}")
+        self.assertNotIn("badge", t.render(template.Context()))
+        self.assertEqual(self.counts.calls, [])
+
+    def test_timeout(self):
+        class AuthenticatedUser:
+            is_active = True
+            is_authenticated = True
+            is_superuser = False
+            pk = 1
+
+        self.request.user = AuthenticatedUser()
+        with self.settings(NAVTAG_BADGE_TIMEOUT=30):
+            self.render()
+            self.request = RequestFactory().get("/")
+            self.request.user = AuthenticatedUser()
+            self.assertIn('class="badge">3<', self.render())
+        self.assertEqual(len(self.counts.calls), 1)
+        self.assertEqual(len(self.other.calls), 1)
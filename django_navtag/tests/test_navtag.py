@@ -1,9 +1,29 @@
+import contextlib
+import gc
+from unittest import mock
+
 from django import template
+from django.core.cache import caches
+from django.core.exceptions import ImproperlyConfigured
+from django.http import HttpResponse
 from django.template.loader import render_to_string
-from django.test import TestCase
+from django.test import TestCase, override_settings
+from django.urls import (
+    NoReverseMatch,
+    clear_url_caches,
+    reverse,
+    set_script_prefix,
+    set_urlconf,
+)
+from django.utils import translation
 from django.utils.html import escape
 
-from django_navtag.templatetags.navtag import NavNode
+from django_navtag.templatetags.navtag import (
+    NO_TEMPLATE,
+    NavNode,
+    URLTemplate,
+    url_templates,
+)
 
 BASIC_TEMPLATE = """
 {% load navtag %}
@@ -121,6 +141,40 @@ class NavTagTest(TestCase):
         )
         self.assertEqual(content, "")
 
+    def test_nav_registry(self):
+        """Navs are found in the base context dict, however deep the stack"""
+        from django_navtag.templatetags.navtag import get_nav
+
+        t = template.Template(
+            "{% load navtag %}{% nav 'home' %}{% nav 'about' for sidenav %}"
+            "{% with a=1 %}{% with b=2 %}{% for i in '12' %}"
+            "{% navlink 'home' 'home' %}Home{% endnavlink %}"
+            "{% navlink 'sidenav:about' 'about' %}About{% endnavlink %}"
+            "{{ nav.home }}"
+            "{% endfor %}{% endwith %}{% endwith %}"
+        )
+        c = template.Context()
+        base = c.dicts[0]
+        content = t.render(c)
+        self.assertEqual(
+            content,
+            '<a href="/">Home</a><a href="/about/">About</a>True' * 2,
+        )
+        self.assertNotIn("_navtag", base)
+        navs = c.dicts[0]["_navtag"]
+        self.assertEqual(sorted(navs), ["nav", "sidenav"])
+        self.assertIs(get_nav(c, "nav"), navs["nav"])
+        self.assertIs(get_nav(c, "sidenav"), c["sidenav"])
+        self.assertIsNone(get_nav(c, "other"))
+
+    def test_nav_methods(self):
+        """Nav methods can still be used from templates"""
+        t = template.Template(
+            "{% load navtag %}{% nav 'a.b' %}"
+            "{{ nav.get_active_path }}|{{ nav.a.get_active_path }}|{{ nav.c }}"
+        )
+        self.assertEqual(t.render(template.Context()), "a.b|b|")
+
     def test_yell_if_context_variable_changed(self):
         t = template.Template('{% load navtag %}{% nav "test" %}{{ nav }}')
         c = template.Context({"nav": "anything"})
@@ -651,3 +705,652 @@ NO_NAV_SET
         # When products is the exact match, nav.products returns True
         # We should still be able to iterate (even if empty)
         self.assertEqual(content, "END")
+
+    def test_nav_active_path_cached_on_root(self):
+        """The active path is computed when the nav is set, not per lookup"""
+        from django_navtag.templatetags.navtag import Nav
+
+        nav = Nav()
+        nav.update({"products": {"electronics": {"phones": True}}})
+        state = nav._state
+        self.assertEqual(state.active_path, ("products", "electronics", "phones"))
+        self.assertEqual(state.active_components, {"products", "electronics", "phones"})
+        self.assertEqual(nav.get_active_path(), "products.electronics.phones")
+        self.assertEqual(nav["products"].get_active_path(), "electronics.phones")
+
+        nav.clear()
+        self.assertEqual(state.active_path, ())
+        self.assertEqual(nav.get_active_path(), "")
+        self.assertNotIn("products", nav)
+
+    def test_nav_subnav_off_active_branch(self):
+        """Sub-navs not on the root's active path still find their own path"""
+        from django_navtag.templatetags.navtag import Nav
+
+        nav = Nav()
+        nav.update({"a": {"x": True}, "b": {"y": True}})
+        self.assertEqual(nav.get_active_path(), "a.x")
+        self.assertEqual(nav["b"].get_active_path(), "y")
+        self.assertIn("y", nav["b"])
+        self.assertEqual(list(nav["a"]), ["x"])
+
+    def test_nav_literal_prebuilt(self):
+        """Literal nav items have their path built when the template compiles"""
+        t = template.Template('{% load navtag %}{% nav "products.phones" %}')
+        node = t.nodelist[-1]
+        self.assertEqual(node.active, ("products", "phones"))
+
+        t = template.Template("{% load navtag %}{% nav item %}{% nav 3 %}")
+        self.assertIsNone(t.nodelist[-2].active)
+        self.assertEqual(t.nodelist[-1].active, ("3",))
+
+    def test_nav_update_implied_tree(self):
+        """Updating a nav set from a path builds the tree it implies"""
+        t = template.Template('{% load navtag %}{% nav "products.phones" %}{{ x }}')
+
+        class Capture:
+            def __str__(self):
+                nav = context["nav"]
+                nav.update({"about": True})
+                return ""
+
+        context = template.Context({"x": Capture()})
+        t.render(context)
+        nav = context["nav"]
+        self.assertEqual(nav._tree, {"products": {"phones": True}, "about": True})
+        self.assertEqual(nav.get_active_path(), "products.phones")
+        self.assertEqual(t.nodelist[-2].active, ("products", "phones"))
+
+    def test_nav_interned_paths(self):
+        """Navs set to the same item share the same path tuple"""
+        from django_navtag.templatetags.navtag import Nav
+
+        t = template.Template("{% load navtag %}{% nav item %}")
+        navs = []
+        for item in ["products.phones", "".join(["products", ".phones"])]:
+            context = template.Context({"item": item})
+            t.render(context)
+            navs.append(context["nav"])
+        self.assertIs(navs[0]._state.path, navs[1]._state.path)
+
+        nav = Nav()
+        nav.update({"".join(["prod", "ucts"]): True})
+        self.assertIs(nav._state.path[0], navs[0]._state.path[0])
+
+    def test_nav_slots(self):
+        """Navs and their state don't carry a per-instance dict"""
+        from django_navtag.templatetags.navtag import MISSING, Nav
+
+        nav = Nav()
+        self.assertFalse(hasattr(nav, "__dict__"))
+        self.assertFalse(hasattr(nav._state, "__dict__"))
+        self.assertFalse(hasattr(MISSING, "__dict__"))
+
+    def test_navlink_literal_matcher(self):
+        """Literal navlink items are compiled when the template is parsed"""
+        from django_navtag.templatetags.navtag import NavMatcher
+
+        t = template.Template(
+            "{% load navtag %}"
+            "{% navlink 'sidenav:courses!list.old' 'home' %}Courses{% endnavlink %}"
+        )
+        matcher = t.nodelist[-1].matcher
+        self.assertEqual(matcher.var_name, "sidenav")
+        self.assertEqual(matcher.parent, ("courses",))
+        self.assertEqual(matcher.exclude, ("list", "old"))
+        self.assertEqual(matcher.mode, NavMatcher.CHILDREN)
+
+    def test_glob_patterns(self):
+        """Glob patterns match whole components of the active path"""
+        from django_navtag.templatetags.navtag import Nav
+
+        nav = Nav()
+        nav._activate(("products", "phones", "detail"))
+        self.assertTrue(nav == "products.*.detail")
+        self.assertFalse(nav == "products.*")
+        self.assertTrue(nav == "products.**")
+        self.assertTrue(nav == "**.detail")
+        self.assertTrue(nav == "products.**.detail")
+        self.assertFalse(nav == "products.**.phones")
+        self.assertTrue(nav == "products.(tablets|phones).*")
+        self.assertFalse(nav == "products.(tablets|laptops).*")
+        self.assertTrue(nav["products"] == "*.detail")
+
+        nav._activate(("products",))
+        self.assertTrue(nav == "products.**")
+        self.assertFalse(nav == "products.*")
+        self.assertFalse(nav == "*.**.*")
+
+    def test_navlink_glob_pattern(self):
+        """Navlink globs also match descendants, like plain items"""
+        from django_navtag.templatetags.navtag import NavMatcher
+
+        t = template.Template(
+            "{% load navtag %}{% nav item %}"
+            "{% navlink 'account.(orders|returns)' 'home' %}A{% endnavlink %}"
+            "{% navlink 'account.*.detail' 'home' %}B{% endnavlink %}"
+        )
+        self.assertEqual(t.nodelist[-1].matcher.mode, NavMatcher.GLOB)
+        for item, expected in (
+            ("account", "<span>A</span><span>B</span>"),
+            ("account.orders", '<a href="/">A</a><span>B</span>'),
+            ("account.returns.detail", '<a href="/">A</a><a href="/">B</a>'),
+            ("account.wishlist.detail.x", '<span>A</span><a href="/">B</a>'),
+        ):
+            content = t.render(template.Context({"item": item}))
+            self.assertEqual(content, expected, item)
+
+    def test_navlink_variable_item(self):
+        """Navlink items from variables are compiled (and cached) at render"""
+        from django_navtag.templatetags.navtag import compile_pattern
+
+        t = template.Template(
+            "{% load navtag %}{% nav text 'active' %}{% nav 'products' %}"
+            "{% for item in items %}"
+            "{% navlink item 'home' %}{{ item }}{% endnavlink %}"
+            "{% endfor %}"
+        )
+        self.assertIsNone(t.nodelist[-1].nodelist_loop[0].matcher)
+        content = t.render(template.Context({"items": ["products", "about"]}))
+        self.assertEqual(
+            content, '<a href="/" class="active">products</a><span>about</span>'
+        )
+        self.assertIs(
+            compile_pattern("products", navlink=True),
+            compile_pattern("products", navlink=True),
+        )
+
+    def test_navlink_static_content(self):
+        """Plain text navlink bodies are joined when the template is parsed"""
+        t = template.Template(
+            "{% load navtag %}{% nav text 'active' %}{% nav 'about' %}"
+            "{% navlink 'home' 'home' %}Home{% endnavlink %}"
+            "{% navlink 'about' 'about' %}{{ label }}{% endnavlink %}"
+        )
+        self.assertEqual(t.nodelist[-2].content, "Home")
+        self.assertIsNone(t.nodelist[-1].content)
+        t.nodelist[-2].nodelist = None
+        for inactive, home in (
+            ("span", "<span>Home</span>"),
+            ("link", '<a href="/">Home</a>'),
+            ("none", ""),
+        ):
+            with self.settings(NAVTAG_INACTIVE=inactive):
+                content = t.render(template.Context({"label": "About"}))
+            self.assertEqual(
+                content, home + '<a href="/about/" class="active">About</a>'
+            )
+
+    def test_nav_eq_exclude_is_component_wise(self):
+        """Excluded items are whole path components, not string prefixes"""
+        from django_navtag.templatetags.navtag import Nav
+
+        nav = Nav()
+        nav.update({"courses": {"listing": True}})
+        self.assertTrue(nav == "courses!list")
+        self.assertFalse(nav == "courses!listing")
+
+    def test_nav_child_views_cached(self):
+        """Sub-navigation lookups return the same read-only view each time"""
+        from django_navtag.templatetags.navtag import Nav
+
+        nav = Nav()
+        nav.update({"products": {"phones": True}})
+        products = nav["products"]
+        self.assertIs(nav["products"], products)
+        self.assertIs(products["phones"], nav["products"]["phones"])
+        self.assertRaises(TypeError, products.update, {"tablets": True})
+        self.assertRaises(TypeError, products.clear)
+
+        nav.update({"about": True})
+        self.assertIsNot(nav["products"], products)
+
+    def test_nav_missing_item(self):
+        """Missing items return a shared falsy nav rather than raising"""
+        from django_navtag.templatetags.navtag import MISSING, Nav
+
+        nav = Nav()
+        nav.update({"products": {"phones": True}})
+        self.assertIs(nav["about"], MISSING)
+        self.assertIs(nav["products"]["tablets"]["case"], MISSING)
+        self.assertIs(nav["products"]["phones"]["case"], MISSING)
+        self.assertFalse(MISSING)
+        self.assertEqual(str(MISSING), "")
+        self.assertNotIn("products", MISSING)
+        self.assertFalse(MISSING == "")
+        self.assertEqual(list(MISSING), [])
+        self.assertRaises(TypeError, MISSING.update, {"about": True})
+
+        content = template.Template(
+            "{% load navtag %}{% nav 'products' %}"
+            "[{{ nav.about }}][{{ nav.about.team }}]"
+            "{% if nav.about %}ABOUT{% endif %}"
+        ).render(template.Context())
+        self.assertEqual(content, "[][]")
+
+    def test_nav_no_reference_cycles(self):
+        """Navs are freed by reference counting once rendering finishes"""
+        from django_navtag.templatetags.navtag import Nav, _NavState
+
+        t = template.Template(
+            "{% load navtag %}{% nav text 'active' %}{% nav 'products.phones' %}"
+            "{% if nav.products.phones %}{{ nav.products }}{% endif %}"
+            "{% navlink 'products' 'products' %}Products{% endnavlink %}"
+        )
+        gc.collect()
+        gc.set_debug(gc.DEBUG_SAVEALL)
+        try:
+            t.render(template.Context())
+            render_to_string("navtag_tests/submenu/apple.txt")
+            gc.collect()
+            cyclic = [obj for obj in gc.garbage if isinstance(obj, (Nav, _NavState))]
+        finally:
+            gc.set_debug(0)
+            gc.garbage.clear()
+        self.assertEqual(cyclic, [])
+
+    @contextlib.contextmanager
+    def patch_reverse(self):
+        """Count every reverse() call, including those for URL templates"""
+        with mock.patch("django.urls.reverse", wraps=reverse) as patched:
+            with mock.patch("django_navtag.templatetags.navtag.reverse", patched):
+                yield patched
+
+    def test_navlink_url_reversed_once_per_render(self):
+        """The same URL is only reversed once during a render"""
+        t = template.Template(
+            "{% load navtag %}{% nav 'products' %}"
+            "{% for i in '123' %}"
+            "{% navlink 'products' 'products' %}Products{% endnavlink %}"
+            "{% navlink 'products' 'product_detail' product_id=i %}P{% endnavlink %}"
+            "{% endfor %}"
+        )
+        url_templates.clear()
+        with self.patch_reverse() as patched:
+            content = t.render(template.Context())
+            # The product URLs are built from a template after the first.
+            self.assertEqual(patched.call_count, 2)
+            t.render(template.Context())
+            self.assertEqual(patched.call_count, 3)
+        self.assertEqual(content.count('<a href="/products/">Products</a>'), 3)
+        self.assertIn('<a href="/products/3/">P</a>', content)
+
+    def test_navlink_url_cache(self):
+        """Argument-less URL names can be cached across renders"""
+        from django_navtag.templatetags.navtag import url_cache
+
+        t = template.Template(
+            "{% load navtag %}{% nav 'home' %}"
+            "{% navlink 'home' 'about' %}About{% endnavlink %}"
+            "{% navlink 'home' 'product_detail' 1 %}Product{% endnavlink %}"
+        )
+        url_templates.clear()
+        with self.settings(NAVTAG_URL_CACHE_SIZE=10):
+            with self.patch_reverse() as patched:
+                t.render(template.Context())
+                t.render(template.Context())
+                self.assertEqual(patched.call_count, 2)
+                self.assertEqual(len(url_cache), 1)
+
+                clear_url_caches()
+                t.render(template.Context())
+                self.assertEqual(patched.call_count, 4)
+
+                set_urlconf("django_navtag.tests.alt_urls")
+                try:
+                    content = t.render(template.Context())
+                finally:
+                    set_urlconf(None)
+                self.assertEqual(patched.call_count, 6)
+                self.assertIn("/alt/about/", content)
+        self.assertEqual(len(url_cache), 0)
+
+    def test_navlink_inactive_skips_url(self):
+        """Inactive navlinks rendered as spans never reverse their URL"""
+
+        class Product:
+            @property
+            def id(self):
+                raise AssertionError("URL arguments should not be resolved")
+
+        t = template.Template(
+            "{% load navtag %}{% nav 'home' %}"
+            "{% navlink 'products' 'product_detail' product_id=product.id %}"
+            "Product{% endnavlink %}"
+        )
+        content = t.render(template.Context({"product": Product()}))
+        self.assertEqual(content, "<span>Product</span>")
+
+    def test_navlink_inactive_modes(self):
+        """The NAVTAG_INACTIVE setting chooses how inactive items render"""
+        t = template.Template(
+            "{% load navtag %}{% nav text 'active' %}{% nav 'home' %}"
+            "{% navlink 'home' 'home' %}Home{% endnavlink %}"
+            "{% navlink 'about' 'about' %}About{% endnavlink %}"
+        )
+        active = '<a href="/" class="active">Home</a>'
+        with self.settings(NAVTAG_INACTIVE="link"):
+            content = t.render(template.Context())
+        self.assertEqual(content, active + '<a href="/about/">About</a>')
+        with self.settings(NAVTAG_INACTIVE="none"):
+            content = t.render(template.Context())
+        self.assertEqual(content, active)
+        with self.settings(NAVTAG_INACTIVE="hidden"):
+            self.assertRaises(ImproperlyConfigured, t.render, template.Context())
+
+    def test_settings_read_once(self):
+        """Settings used by every navlink aren't looked up on each render"""
+        from django_navtag.templatetags import navtag
+
+        class NoSettings:
+            def __getattr__(self, name):
+                raise AssertionError("{} was read again".format(name))
+
+        t = template.Template(
+            "{% load navtag %}{% nav 'home' %}"
+            "{% navlink 'about' 'about' %}About{% endnavlink %}"
+        )
+        content = t.render(template.Context())
+        with mock.patch.object(navtag, "settings", NoSettings()):
+            self.assertEqual(t.render(template.Context()), content)
+
+
+class Counter:
+    def __init__(self):
+        self.count = 0
+
+    def __str__(self):
+        self.count += 1
+        return str(self.count)
+
+
+class NavCacheTest(TestCase):
+    def setUp(self):
+        from django_navtag.templatetags.navtag import fragment_cache
+
+        caches["default"].clear()
+        fragment_cache.clear()
+        self.counter = Counter()
+
+    def render(self, nav_item, text="active", timeout="60", extra=""):
+        t = template.Template(
+            "{% load navtag %}{% nav text '" + text + "' %}{% nav item %}"
+            "{% navcache " + timeout + " 'menu' " + extra + "%}"
+            "{{ counter }}"
+            "{% endnavcache %}"
+        )
+        return t.render(template.Context({"item": nav_item, "counter": self.counter}))
+
+    def test_cached_per_nav_state(self):
+        self.assertEqual(self.render("home"), "1")
+        self.assertEqual(self.render("home"), "1")
+        self.assertEqual(self.render("about"), "2")
+        self.assertEqual(self.render("about", text="selected"), "3")
+        self.assertEqual(self.render("home"), "1")
+
+    def test_varies_on_language_and_urlconf(self):
+        self.assertEqual(self.render("home"), "1")
+        with translation.override("fr"):
+            self.assertEqual(self.render("home"), "2")
+        set_urlconf("django_navtag.tests.alt_urls")
+        try:
+            self.assertEqual(self.render("home"), "3")
+        finally:
+            set_urlconf(None)
+
+    def test_local_tier(self):
+        self.assertEqual(self.render("home"), "1")
+        caches["default"].clear()
+        self.assertEqual(self.render("home"), "1")
+
+    def test_shared_tier(self):
+        from django_navtag.templatetags.navtag import fragment_cache
+
+        self.assertEqual(self.render("home"), "1")
+        fragment_cache.clear()
+        self.assertEqual(self.render("home"), "1")
+        self.assertEqual(len(fragment_cache), 1)
+
+    def test_local_expiry(self):
+        """Local copies expire with the shared entry, or after a minute"""
+        from django_navtag.templatetags import navtag
+
+        with mock.patch.object(navtag, "time") as patched:
+            patched.time.return_value = 1000
+            self.assertEqual(self.render("home"), "1")
+            # Copied from the shared cache, with the shared entry's expiry.
+            navtag.fragment_cache.clear()
+            patched.time.return_value = 1050
+            self.assertEqual(self.render("home"), "1")
+            patched.time.return_value = 1061
+            self.assertEqual(self.render("home"), "2")
+
+            self.assertEqual(self.render("about", timeout="None"), "3")
+            caches["default"].clear()
+            patched.time.return_value = 1120
+            self.assertEqual(self.render("about", timeout="None"), "3")
+            patched.time.return_value = 1122
+            self.assertEqual(self.render("about", timeout="None"), "4")
+            with self.settings(NAVTAG_LOCAL_CACHE_TIMEOUT=5):
+                self.assertEqual(self.render("contact", timeout="None"), "5")
+                caches["default"].clear()
+                patched.time.return_value = 1128
+                self.assertEqual(self.render("contact", timeout="None"), "6")
+
+    def test_no_timeout(self):
+        self.assertEqual(self.render("home", timeout="0"), "1")
+        self.assertEqual(self.render("home", timeout="0"), "2")
+        self.assertEqual(self.render("home", timeout="None"), "3")
+        self.assertEqual(self.render("home", timeout="None"), "3")
+
+    def test_for(self):
+        self.assertEqual(self.render("home", extra="for sidenav "), "1")
+        self.assertEqual(self.render("about", extra="for sidenav "), "1")
+
+    def test_invalid(self):
+        self.assertRaises(
+            template.TemplateSyntaxError,
+            template.Template,
+            "{% load navtag %}{% navcache 60 %}{% endnavcache %}",
+        )
+        self.assertRaises(
+            template.TemplateSyntaxError, self.render, "home", timeout="'soon'"
+        )
+
+
+STATIC_TEMPLATE = """{% load navtag %}{% nav text 'active' %}{% nav item %}
+{% navlink 'home' 'home' %}Home{% endnavlink %}
+{% navlink 'products' 'products' %}Products{% endnavlink %}
+{% navlink 'products!' 'about' %}Sub{% endnavlink %}
+{% navmarker %}"""
+
+
+@override_settings(NAVTAG_STATIC_MARKUP=True)
+class StaticMarkupTest(TestCase):
+    def render(self, item):
+        return template.Template(STATIC_TEMPLATE).render(
+            template.Context({"item": item})
+        )
+
+    def process(self, content, content_type="text/html; charset=utf-8"):
+        from django_navtag.middleware import NavMarkupMiddleware
+
+        response = HttpResponse(content, content_type=content_type)
+        response["Content-Length"] = len(response.content)
+        return NavMarkupMiddleware(lambda request: response)(None)
+
+    def test_same_markup(self):
+        home = self.render("home")
+        products = self.render("products.phones")
+        self.assertIn('<a href="/" data-nav-path="home">Home</a>', home)
+        self.assertEqual(home.split("<!--")[0], products.split("<!--")[0])
+        self.assertIn(
+            '<!--navtag:{"var": "nav", "path": "products.phones", "text": "active"}-->',
+            products,
+        )
+
+    def test_middleware(self):
+        response = self.process(self.render("products.phones"))
+        content = response.content.decode()
+        self.assertNotIn("<!--", content)
+        self.assertIn('data-nav-path="home">Home', content)
+        self.assertIn('data-nav-path="products" class="active">Products', content)
+        self.assertIn('data-nav-path="products!" class="active">Sub', content)
+        self.assertEqual(response["Content-Length"], str(len(response.content)))
+
+        content = self.process(self.render("products")).content.decode()
+        self.assertIn('data-nav-path="products" class="active">Products', content)
+        self.assertIn('data-nav-path="products!">Sub', content)
+
+    def test_middleware_skips(self):
+        content = self.render("home")
+        response = self.process(content, content_type="application/json")
+        self.assertEqual(response.content.decode(), content)
+        # Pages without a marker aren't decoded at all.
+        response = self.process(b"<p>\xff</p>")
+        self.assertEqual(response.content, b"<p>\xff</p>")
+
+    def test_marker_escaping(self):
+        t = template.Template(
+            "{% load navtag %}{% nav text 'a--b' for sidenav %}{% nav 'x' for sidenav %}"
+            "{% navmarker for sidenav %}"
+        )
+        output = t.render(template.Context())
+        self.assertEqual(output.count("--"), 2)
+        content = self.process(
+            '<a href="/" data-nav-path="sidenav:x">X</a>' + output
+        ).content.decode()
+        self.assertEqual(
+            content, '<a href="/" data-nav-path="sidenav:x" class="a--b">X</a>'
+        )
+
+    def test_script(self):
+        t = template.Template(
+            "{% load navtag %}{% nav '</script>' %}{% navmarker script %}"
+        )
+        output = t.render(template.Context())
+        self.assertTrue(output.startswith("<script>(function"))
+        self.assertEqual(output.count("</script>"), 1)
+
+    @override_settings(NAVTAG_STATIC_MARKUP=False)
+    def test_disabled(self):
+        self.assertNotIn("data-nav-path", self.render("home"))
+
+    def test_invalid(self):
+        self.assertRaises(
+            template.TemplateSyntaxError,
+            template.Template,
+            "{% load navtag %}{% navmarker sidenav %}",
+        )
+
+
+class URLTemplateTest(TestCase):
+    def setUp(self):
+        url_templates.clear()
+
+    def render(self, source, **context):
+        t = template.Template("{% load navtag %}{% nav 'x' %}" + source)
+        return t.render(template.Context(context))
+
+    def test_matches_reverse(self):
+        values = ["a", "a b", "ü/", "50%", "&<>", "~:@!$'()*+,;=", "x?y#z"]
+        content = self.render(
+            "{% for v in values %}"
+            "{% navlink 'x' 'navtag:subtree' v 'item' %}{% endnavlink %}"
+            "{% navlink 'x' 'navtag:subtree' name='main' path=v %}{% endnavlink %}"
+            "{% endfor %}",
+            values=values[:1] + [v for v in values if "/" not in v],
+        )
+        for value in values:
+            if "/" in value:
+                continue
+            for url in (
+                reverse("navtag:subtree", args=[value, "item"]),
+                reverse("navtag:subtree", kwargs={"name": "main", "path": value}),
+            ):
+                self.assertIn('<a href="{}">'.format(escape(url)), content)
+        self.assertEqual(len(url_templates), 2)
+
+    def test_reversed_once(self):
+        source = (
+            "{% for i in ids %}"
+            "{% navlink 'x' 'product_detail' i %}{{ i }}{% endnavlink %}"
+            "{% endfor %}"
+        )
+        with mock.patch(
+            "django_navtag.templatetags.navtag.reverse", wraps=reverse
+        ) as patched:
+            content = self.render(source, ids=range(200))
+        self.assertEqual(patched.call_count, 1)
+        self.assertIn('<a href="/products/0/">0</a>', content)
+        self.assertIn('<a href="/products/199/">199</a>', content)
+
+    def test_shared_name(self):
+        """Names with several routes are always reversed normally"""
+        content = self.render(
+            "{% for v in values %}"
+            "{% navlink 'x' 'shared' v %}P{% endnavlink %}"
+            "{% endfor %}",
+            values=["a", 5],
+        )
+        self.assertEqual(
+            content,
+            '<a href="{}">P</a><a href="{}">P</a>'.format(
+                reverse("shared", args=["a"]), reverse("shared", args=[5])
+            ),
+        )
+        self.assertEqual(list(url_templates._data.values()), [NO_TEMPLATE])
+
+    def test_equal_values(self):
+        """Equal values of different types are remembered separately"""
+        values = [1, 1.0, True]
+        content = self.render(
+            "{% for v in values %}"
+            "{% navlink 'x' 'shared' v %}P{% endnavlink %}"
+            "{% navlink 'x' 'shared' x=v %}P{% endnavlink %}"
+            "{% endfor %}",
+            values=values,
+        )
+        self.assertEqual(
+            content,
+            "".join(
+                '<a href="{0}">P</a><a href="{0}">P</a>'.format(
+                    reverse("shared", args=[v])
+                )
+                for v in values
+            ),
+        )
+
+    def test_invalid_values(self):
+        source = "{% navlink 'x' 'product_detail' i %}P{% endnavlink %}"
+        self.render(source, i=1)
+        with self.assertRaises(NoReverseMatch):
+            self.render(source, i="abc")
+        with self.assertRaises(NoReverseMatch):
+            self.render("{% navlink 'x' 'navtag:subtree' 'a/b' 'c' %}P{% endnavlink %}")
+
+    def test_script_prefix(self):
+        source = "{% navlink 'x' 'product_detail' i %}P{% endnavlink %}"
+        self.render(source, i=1)
+        set_script_prefix("/sub dir/")
+        try:
+            content = self.render(source, i=2)
+        finally:
+            set_script_prefix("/")
+        self.assertEqual(content, '<a href="/sub%20dir/products/2/">P</a>')
+
+    def test_regex_routes(self):
+        source = "{% navlink 'x' 'legacy' slug %}P{% endnavlink %}"
+        self.assertEqual(self.render(source, slug="a"), '<a href="/legacy/a/">P</a>')
+        self.assertEqual(self.render(source, slug="b"), '<a href="/legacy/b/">P</a>')
+        self.assertIs(list(url_templates._data.values())[0], NO_TEMPLATE)
+
+    def test_url_template(self):
+        url_template = URLTemplate.from_route("a/<int:pk>/<slug>/", "/")
+        self.assertEqual(url_template.substitute((1, "b"), {}), "/a/1/b/")
+        self.assertEqual(url_template.substitute((), {"pk": 2, "slug": "c"}), "/a/2/c/")
+        self.assertIsNone(url_template.substitute((1,), {}))
+        self.assertIsNone(url_template.substitute((), {"pk": 2, "other": "c"}))
+        self.assertIsNone(url_template.substitute(("x", "b"), {}))
+        self.assertIsNone(URLTemplate.from_route("^a/(?P<pk>[0-9]+)/$", "/"))
+        self.assertIsNone(URLTemplate.from_route("a/<unknown:pk>/", "/"))
@@ -0,0 +1,68 @@
+from django.test import TestCase, override_settings
+
+from django_navtag.resolvers import PathResolver, get_path_resolver
+
+PREFIXES = {
+    "/products/": "products",
+    "/products/phones/": "products.phones",
+    "/about": "about",
+}
+
+
+def get_prefixes():
+    return {"/cms/": "cms"}
+
+
+class PathResolverTest(TestCase):
+    def test_longest_prefix(self):
+        resolver = PathResolver(PREFIXES)
+        self.assertEqual(len(resolver), 3)
+        self.assertEqual(resolver.resolve("/products/"), "products")
+        self.assertEqual(resolver.resolve("/products/tablets/1/"), "products")
+        self.assertEqual(resolver.resolve("/products/phones/"), "products.phones")
+        self.assertEqual(resolver.resolve("/products/phones/x/y"), "products.phones")
+        self.assertEqual(resolver.resolve("/about/"), "about")
+
+    def test_whole_segments(self):
+        resolver = PathResolver(PREFIXES)
+        self.assertIsNone(resolver.resolve("/productsale/"))
+        self.assertIsNone(resolver.resolve("/"))
+        self.assertIsNone(resolver.resolve("/contact/products/"))
+
+    def test_root(self):
+        resolver = PathResolver([("/", "home"), ("/about/", "about")])
+        self.assertEqual(resolver.resolve("/"), "home")
+        self.assertEqual(resolver.resolve("/contact/"), "home")
+        self.assertEqual(resolver.resolve("/about/team/"), "about")
+
+    def test_setting(self):
+        self.assertIsNone(get_path_resolver())
+        with self.settings(NAVTAG_PATH_PREFIXES=PREFIXES):
+            self.assertEqual(get_path_resolver().resolve("/about/"), "about")
+            self.assertIs(get_path_resolver(), get_path_resolver())
+        with self.settings(NAVTAG_PATH_PREFIXES=get_prefixes):
+            self.assertEqual(get_path_resolver().resolve("/cms/a/"), "cms")
+        with self.settings(
+            NAVTAG_PATH_PREFIXES="django_navtag.tests.test_resolvers.get_prefixes"
+        ):
+            self.assertEqual(get_path_resolver().resolve("/cms/a/"), "cms")
+        self.assertIsNone(get_path_resolver())
+
+    @override_settings(
+        ROOT_URLCONF="django_navtag.tests.view_urls",
+        TEMPLATES=[
+            {
+                "BACKEND": "django.template.backends.django.DjangoTemplates",
+                "OPTIONS": {
+                    "context_processors": ["django_navtag.context_processors.nav"],
+                },
+            }
+        ],
+        NAVTAG_PATH_PREFIXES={"/plain/": "products.plain", "/phones/": "x"},
+    )
+    def test_request_nav(self):
+        content = self.client.get("/plain/").content.decode()
+        self.assertEqual(content, "{'products': {'plain': True}}|active")
+        # Views setting their own item take precedence.
+        content = self.client.get("/phones/").content.decode()
+        self.assertEqual(content, "{'products': {'phones': True}}|active")
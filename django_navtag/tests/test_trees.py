@@ -0,0 +1,89 @@
+import pickle
+
+from django.core.exceptions import ImproperlyConfigured
+from django.test import SimpleTestCase
+
+from django_navtag.menus import Menu
+from django_navtag.trees import MenuTree
+
+PATHS = [
+    "home",
+    "products",
+    "products.phones",
+    "products.phones.android",
+    "products.tablets",
+    "about.team",
+]
+PARENTS = [-1, -1, 1, 2, 1, -1]
+
+
+def make_tree():
+    return MenuTree(
+        PATHS,
+        ["/{}/".format(path) for path in PATHS],
+        [path.title() for path in PATHS],
+        PARENTS,
+    )
+
+
+class MenuTreeTest(SimpleTestCase):
+    def test_arrays(self):
+        tree = make_tree()
+        self.assertEqual(len(tree), 6)
+        self.assertEqual(list(tree.depths), [0, 0, 1, 2, 1, 0])
+        self.assertEqual(list(tree.ends), [1, 5, 4, 4, 5, 6])
+        self.assertEqual(
+            tree.slugs,
+            ("home", "products", "phones", "android", "tablets", "about.team"),
+        )
+        self.assertEqual([tree.path(i) for i in range(6)], PATHS)
+
+    def test_find(self):
+        tree = make_tree()
+        self.assertEqual(tree.find("products.phones.android"), 3)
+        self.assertEqual(tree.find("about.team"), 5)
+        self.assertIsNone(tree.find("about"))
+
+    def test_structure(self):
+        tree = make_tree()
+        self.assertEqual(list(tree.children()), [0, 1, 5])
+        self.assertEqual(list(tree.children(1)), [2, 4])
+        self.assertEqual(list(tree.children(3)), [])
+        self.assertEqual(list(tree.ancestors(3)), [2, 1])
+        self.assertTrue(tree.is_ancestor(1, 3))
+        self.assertFalse(tree.is_ancestor(2, 4))
+        self.assertFalse(tree.is_ancestor(3, 3))
+
+    def test_active(self):
+        tree = make_tree()
+        active_path = ("products", "phones", "x")
+        self.assertEqual(tree.active_items(active_path), {1, 2})
+        self.assertEqual(tree.active_items(("about", "team")), {5})
+        self.assertEqual(tree.active_items(()), set())
+        self.assertEqual([i for i in range(6) if tree.matches(i, active_path)], [1, 2])
+
+    def test_pickle(self):
+        tree = pickle.loads(pickle.dumps(make_tree()))
+        self.assertEqual(tree.find("products.tablets"), 4)
+        self.assertEqual(list(tree.children(1)), [2, 4])
+        self.assertIs(tree.slugs[2], make_tree().slugs[2])
+
+    def test_from_menu(self):
+        menu = Menu(
+            "test",
+            [
+                ("home", "home", "Home"),
+                ("products", "products", "Products", [("products.a", "/a/", "A")]),
+            ],
+        )
+        tree = MenuTree.from_menu(menu)
+        self.assertEqual(list(tree.parents), [-1, -1, 1])
+        self.assertEqual(tree.slugs[2], "a")
+
+    def test_invalid(self):
+        self.assertRaises(
+            ImproperlyConfigured, MenuTree, ["a", "b.c"], ["", ""], ["", ""], [-1, 0]
+        )
+        self.assertRaises(
+            ImproperlyConfigured, MenuTree, ["a.b", "a"], ["", ""], ["", ""], [1, -1]
+        )
@@ -0,0 +1,79 @@
+from asgiref.sync import iscoroutinefunction
+from django.template import Context, RequestContext, Template, TemplateSyntaxError
+from django.test import TestCase, override_settings
+
+from django_navtag.context_processors import nav as nav_processor
+
+TEMPLATES = [
+    {
+        "BACKEND": "django.template.backends.django.DjangoTemplates",
+        "APP_DIRS": True,
+        "OPTIONS": {
+            "context_processors": ["django_navtag.context_processors.nav"],
+        },
+    },
+]
+
+
+@override_settings(
+    ROOT_URLCONF="django_navtag.tests.view_urls",
+    TEMPLATES=TEMPLATES,
+    NAVTAG_VIEWS={
+        "account": "account",
+        "shop:cart": "shop.cart",
+        "shop:": "shop",
+    },
+)
+class ViewNavTest(TestCase):
+    def get(self, url):
+        return self.client.get(url).content.decode()
+
+    def test_decorator(self):
+        self.assertEqual(self.get("/phones/"), "{'products': {'phones': True}}|active")
+
+    def test_async_decorator(self):
+        from django_navtag.tests.view_urls import cases
+
+        self.assertTrue(iscoroutinefunction(cases))
+        self.assertEqual(self.get("/cases/"), "{'products': {'cases': True}}|active")
+
+    def test_mixin(self):
+        self.assertEqual(
+            self.get("/tablets/"), "{'products': {'tablets': True}}|active"
+        )
+
+    def test_url_name(self):
+        self.assertEqual(self.get("/account/"), "{'account': True}|")
+
+    def test_view_name(self):
+        self.assertEqual(self.get("/shop/cart/"), "{'shop': {'cart': True}}|")
+
+    def test_namespace(self):
+        self.assertEqual(self.get("/shop/"), "{'shop': True}|")
+
+    def test_template_fallback(self):
+        # Nothing set for the view, so the template's {% nav %} tag is used.
+        self.assertEqual(self.get("/plain/"), "{'about': True}|")
+
+    def test_settings_change(self):
+        with self.settings(NAVTAG_VIEWS={"plain": "plain"}):
+            self.assertEqual(self.get("/plain/"), "{'plain': True}|")
+        self.assertEqual(self.get("/plain/"), "{'about': True}|")
+
+    def test_processor_nav_is_per_render(self):
+        request = self.client.get("/phones/").wsgi_request
+        t = Template("{% load navtag %}{% nav text 'on' %}{{ nav.products }}")
+        self.assertEqual(t.render(RequestContext(request)), "on")
+        self.assertEqual(
+            nav_processor(request)["nav"]._text, {"products": {"phones": True}}
+        )
+
+    def test_altered(self):
+        request = self.client.get("/phones/").wsgi_request
+        t = Template("{% load navtag %}{% with nav=1 %}{% nav 'x' %}{% endwith %}")
+        with self.assertRaises(TemplateSyntaxError):
+            t.render(RequestContext(request))
+        self.assertEqual(
+            Template("{% load navtag %}{% nav 'x' %}{{ nav }}").render(Context()),
+            "{'x': True}",
+        )
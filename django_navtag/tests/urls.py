@@ -0,0 +1,18 @@
+from django.http import HttpResponse
+from django.urls import include, path, re_path
+
+
+def view(request, **kwargs):
+    return HttpResponse()
+
+
+urlpatterns = [
+    path("", view, name="home"),
+    path("products/", view, name="products"),
+    path("products/<int:product_id>/", view, name="product_detail"),
+    path("about/", view, name="about"),
+    path("navtag/", include("django_navtag.urls")),
+    re_path(r"^legacy/(?P<slug>[a-z]+)/$", view, name="legacy"),
+    path("shared/<str:x>/", view, name="shared"),
+    path("shared/n/<int:x>/", view, name="shared"),
+]
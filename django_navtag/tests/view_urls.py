@@ -0,0 +1,47 @@
+from django.http import HttpResponse
+from django.template import RequestContext, Template
+from django.urls import include, path
+from django.views.generic import View
+
+from django_navtag.views import NavMixin, nav
+
+TEMPLATE = (
+    "{% load navtag %}{% nav 'about' %}{{ nav }}|"
+    "{% nav text 'active' %}{{ nav.products }}"
+)
+
+
+def render(request):
+    return HttpResponse(Template(TEMPLATE).render(RequestContext(request)))
+
+
+@nav("products.phones")
+def phones(request):
+    return render(request)
+
+
+@nav("products.cases")
+async def cases(request):
+    return render(request)
+
+
+class TabletsView(NavMixin, View):
+    nav_item = "products.tablets"
+
+    def get(self, request):
+        return render(request)
+
+
+shop_patterns = [
+    path("", render, name="index"),
+    path("cart/", render, name="cart"),
+]
+
+urlpatterns = [
+    path("phones/", phones, name="phones"),
+    path("tablets/", TabletsView.as_view(), name="tablets"),
+    path("cases/", cases, name="cases"),
+    path("account/", render, name="account"),
+    path("plain/", render, name="plain"),
+    path("shop/", include((shop_patterns, "shop"))),
+]
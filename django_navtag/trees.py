@@ -0,0 +1,163 @@
+"""
+A compact, picklable representation of (very) large menus.
+"""
+
+import sys
+from array import array
+
+from django.core.exceptions import ImproperlyConfigured
+
+
+class MenuTree(object):
+    """
+    A menu tree held as parallel arrays, in depth first order.
+
+    For each item ``i``:
+
+    - ``parents[i]`` is the index of its parent item (``-1`` for root items)
+    - ``depths[i]`` is its depth (``0`` for root items)
+    - ``ends[i]`` is the index just past its last descendant, so the items
+      between ``i + 1`` and ``ends[i]`` are exactly its descendants
+    - ``slugs[i]`` is its nav path relative to its parent (interned)
+    - ``labels[i]`` and ``urls[i]`` are its label and URL (or URL name)
+
+    Finding items by their dotted nav path uses a dict which is built when
+    first needed rather than being pickled.
+    """
+
+    __slots__ = ("parents", "depths", "ends", "slugs", "labels", "urls", "_index")
+
+    def __init__(self, paths, urls, labels, parents):
+        count = len(paths)
+        self.parents = array("i", parents)
+        self.depths = array("i", [0]) * count
+        self.ends = array("i", range(1, count + 1))
+        slugs = []
+        depths = self.depths
+        ends = self.ends
+        for i, path in enumerate(paths):
+            parent = parents[i]
+            if parent < 0:
+                slugs.append(sys.intern(path))
+                continue
+            if parent >= i:
+                raise ImproperlyConfigured("Menu trees must be in depth first order")
+            parent_path = paths[parent]
+            if not path.startswith(parent_path + "."):
+                raise ImproperlyConfigured(
+                    "{!r} is not below its parent {!r}".format(path, parent_path)
+                )
+            slugs.append(sys.intern(path[len(parent_path) + 1 :]))
+            depths[i] = depths[parent] + 1
+        # Walk backwards so each item's end covers its descendants' ends.
+        for i in range(count - 1, -1, -1):
+            parent = parents[i]
+            if parent >= 0 and ends[i] > ends[parent]:
+                ends[parent] = ends[i]
+        self.slugs = tuple(slugs)
+        self.labels = tuple(labels)
+        self.urls = tuple(urls)
+        self._index = None
+
+    @classmethod
+    def from_menu(cls, menu):
+        """Build a tree from a ``django_navtag.menus.Menu``"""
+        items = menu.items
+        return cls(
+            [item.dotted_path for item in items],
+            [item.url_name for item in items],
+            [str(item.label) for item in items],
+            [-1 if item.parent is None else item.parent.index for item in items],
+        )
+
+    def __len__(self):
+        return len(self.slugs)
+
+    def __getstate__(self):
+        return (
+            self.parents,
+            self.depths,
+            self.ends,
+            self.slugs,
+            self.labels,
+            self.urls,
+        )
+
+    def __setstate__(self, state):
+        self.parents, self.depths, self.ends, slugs, self.labels, self.urls = state
+        self.slugs = tuple(sys.intern(slug) for slug in slugs)
+        self._index = None
+
+    @property
+    def index(self):
+        """A dict of dotted nav paths to item indexes"""
+        index = self._index
+        if index is None:
+            index = self._index = {}
+            paths = []
+            parents = self.parents
+            for i, slug in enumerate(self.slugs):
+                parent = parents[i]
+                path = slug if parent < 0 else paths[parent] + "." + slug
+                paths.append(path)
+                index[path] = i
+        return index
+
+    def path(self, i):
+        """The dotted nav path of an item, built in O(depth)"""
+        parts = []
+        parents = self.parents
+        slugs = self.slugs
+        while i >= 0:
+            parts.append(slugs[i])
+            i = parents[i]
+        return ".".join(reversed(parts))
+
+    def find(self, path):
+        """The index of the item with a dotted nav path, or ``None``"""
+        return self.index.get(path)
+
+    def children(self, i=-1):
+        """The indexes of an item's children (or of the root items)"""
+        ends = self.ends
+        child, end = (0, len(self)) if i < 0 else (i + 1, ends[i])
+        while child < end:
+            yield child
+            child = ends[child]
+
+    def ancestors(self, i):
+        """The indexes of an item's ancestors, nearest first"""
+        parents = self.parents
+        i = parents[i]
+        while i >= 0:
+            yield i
+            i = parents[i]
+
+    def is_ancestor(self, ancestor, i):
+        """Check if an item is below another, in O(1)"""
+        return ancestor < i < self.ends[ancestor]
+
+    def matches(self, i, active_path):
+        """
+        Check an item's path against a tuple of active path components (such as
+        from ``Nav``), i.e. whether the item is active or a parent of the active
+        item, in O(depth).
+        """
+        parts = self.path(i).split(".")
+        return tuple(active_path[: len(parts)]) == tuple(parts)
+
+    def active_items(self, active_path):
+        """
+        The set of active items (and their parents) for a tuple of active path
+        components. This takes O(depth) to build, and each check against it is
+        O(1).
+        """
+        index = self.index
+        active = set()
+        path = ""
+        for part in active_path:
+            path = path + "." + part if path else part
+            i = index.get(path)
+            if i is not None:
+                active.add(i)
+        return frozenset(active)
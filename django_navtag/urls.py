@@ -0,0 +1,9 @@
+from django.urls import path
+
+from django_navtag.views import menu_subtree
+
+app_name = "navtag"
+
+urlpatterns = [
+    path("subtree/<str:name>/<str:path>/", menu_subtree, name="subtree"),
+]
@@ -0,0 +1,162 @@
+import functools
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.core.signals import setting_changed
+from django.http import Http404, HttpResponse
+
+from django_navtag.menus import get_menu
+from django_navtag.resolvers import get_path_resolver
+from django_navtag.templatetags.navtag import _inactive_mode, intern_path
+
+try:
+    from asgiref.sync import iscoroutinefunction
+except ImportError:  # asgiref < 3.6
+    from asyncio import iscoroutinefunction
+
+REQUEST_ATTR = "nav_item"
+
+
+def nav(item):
+    """
+    View decorator setting the active nav item for the request.
+
+    Usage::
+
+        @nav("products.phones")
+        def phone_list(request):
+            ...
+
+    Used along with the ``django_navtag.context_processors.nav`` context
+    processor, templates then don't need a ``{% nav %}`` tag of their own.
+    """
+
+    def decorator(view_func):
+        if iscoroutinefunction(view_func):
+
+            @functools.wraps(view_func)
+            async def wrapper(request, *args, **kwargs):
+                setattr(request, REQUEST_ATTR, item)
+                return await view_func(request, *args, **kwargs)
+
+        else:
+
+            @functools.wraps(view_func)
+            def wrapper(request, *args, **kwargs):
+                setattr(request, REQUEST_ATTR, item)
+                return view_func(request, *args, **kwargs)
+
+        wrapper.nav_item = item
+        return wrapper
+
+    return decorator
+
+
+class NavMixin(object):
+    """
+    Class-based view mixin setting the active nav item for the request.
+
+    Set ``nav_item``, or override ``get_nav_item()``.
+    """
+
+    nav_item = None
+
+    def get_nav_item(self):
+        return self.nav_item
+
+    def dispatch(self, request, *args, **kwargs):
+        item = self.get_nav_item()
+        if item is not None:
+            setattr(request, REQUEST_ATTR, item)
+        return super().dispatch(request, *args, **kwargs)
+
+
+@functools.lru_cache(maxsize=None)
+def _view_index():
+    """
+    The ``NAVTAG_VIEWS`` setting, split into lookups by full view name, URL name
+    and namespace.
+    """
+    view_names, url_names, namespaces = {}, {}, {}
+    for name, item in getattr(settings, "NAVTAG_VIEWS", {}).items():
+        if name.endswith(":"):
+            namespaces[name[:-1]] = item
+        elif ":" in name:
+            view_names[name] = item
+        else:
+            url_names[name] = item
+    return view_names, url_names, namespaces
+
+
+def get_nav_item(request):
+    """
+    Get the active nav item for a request, or ``None`` if it isn't known.
+
+    An item set by the ``nav`` decorator or ``NavMixin`` is used first, then the
+    ``NAVTAG_VIEWS`` setting is checked for the resolved view name (e.g.
+    ``"shop:product_detail"``), the URL name (``"product_detail"``) and
+    each namespace, innermost first (``"shop:"``). Finally, the longest
+    matching prefix of the request path in ``NAVTAG_PATH_PREFIXES`` is used.
+    """
+    item = getattr(request, REQUEST_ATTR, None)
+    if item is not None:
+        return item
+    match = getattr(request, "resolver_match", None)
+    if match is not None:
+        item = _resolve_view(match)
+        if item is not None:
+            return item
+    resolver = get_path_resolver()
+    if resolver is not None:
+        return resolver.resolve(request.path_info)
+    return None
+
+
+def _resolve_view(match):
+    view_names, url_names, namespaces = _view_index()
+    item = view_names.get(match.view_name)
+    if item is None and match.url_name:
+        item = url_names.get(match.url_name)
+    if item is None:
+        namespaces_list = match.namespaces
+        for i in range(len(namespaces_list), 0, -1):
+            item = namespaces.get(":".join(namespaces_list[:i]))
+            if item is not None:
+                break
+    return item
+
+
+def _reset_view_index(setting, **kwargs):
+    if setting == "NAVTAG_VIEWS":
+        _view_index.cache_clear()
+
+
+setting_changed.connect(_reset_view_index)
+
+
+def menu_subtree(request, name, path):
+    """
+    Return the collapsed children of a menu item as an HTML fragment.
+
+    This fetches the subtrees left out when rendering a menu with
+    ``{% navmenu "main" branch %}``.
+    """
+    try:
+        menu = get_menu(name)
+    except ImproperlyConfigured:
+        raise Http404("No menu named {!r}".format(name))
+    item = menu.find(intern_path(path))
+    hidden = menu.hidden_items(request)
+    if item is None or not item.children or item.index in hidden:
+        raise Http404("No submenu for {!r}".format(path))
+    # The view's own namespace isn't the application the menu belongs to.
+    current_app = getattr(request, "current_app", None)
+    return HttpResponse(
+        menu.render_subtree(
+            item,
+            _inactive_mode(),
+            current_app=current_app,
+            hidden=hidden,
+            request=request,
+        )
+    )